@@ -0,0 +1,80 @@
+"""
+Time appending one sample to every graph channel and taking the arrays to plot,
+shifting one array per channel with np.roll against ChannelBuffers (which keeps timestamps too
+and copies them to the draw buffers of the channels)
+the peak memory allocated while ticking should stay near zero for ChannelBuffers
+
+    python benchmarks/graph_buffers.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from uaclient.graphwidget import ChannelBuffers
+
+CHANNELS = (10, 100, 500)
+SIZE = 10000
+TICKS = 100
+NOW = datetime.now(timezone.utc)
+
+
+class Roll(object):
+
+    def __init__(self, channels):
+        self.arrays = [np.zeros(SIZE) for _ in range(channels)]
+
+    def tick(self, value):
+        for i, array in enumerate(self.arrays):
+            array = self.arrays[i] = np.roll(array, -1)
+            array[-1] = value
+            array.sum()  # stands for drawing
+
+
+class Ring(object):
+
+    def __init__(self, channels):
+        self.buffers = ChannelBuffers(SIZE)
+        self.channels = [self.buffers.add_channel() for _ in range(channels)]
+
+    def tick(self, value):
+        for channel in self.channels:
+            channel.append(NOW, value)
+            channel.snapshot()[1].sum()  # stands for drawing
+
+
+def measure(cls, channels):
+    """
+    return ms per tick and the peak bytes allocated while ticking
+    """
+    buffers = cls(channels)
+    start = time.perf_counter()
+    for tick in range(TICKS):
+        buffers.tick(tick)
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base, _ = tracemalloc.get_traced_memory()
+    for tick in range(TICKS):
+        buffers.tick(tick)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / TICKS * 1e3, peak - base
+
+
+def main():
+    print("{} samples per channel, {} ticks".format(SIZE, TICKS))
+    print("{:>8} {:>10} {:>12} {:>10} {:>12}".format("channels", "roll ms", "roll bytes", "ring ms", "ring bytes"))
+    for channels in CHANNELS:
+        roll_ms, roll_bytes = measure(Roll, channels)
+        ring_ms, ring_bytes = measure(Ring, channels)
+        print("{:>8} {:>10.2f} {:>12} {:>10.2f} {:>12}".format(channels, roll_ms, roll_bytes, ring_ms, ring_bytes))
+
+
+if __name__ == "__main__":
+    main()
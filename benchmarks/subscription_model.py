@@ -0,0 +1,80 @@
+"""
+Time the data change pipeline (DataChangeHandler and the subscription view)
+for a growing number of subscribed nodes, with the time spent per stage
+the cost per notification should stay flat, whatever the number of rows
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/subscription_model.py
+"""
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+# keep the DuckDB file and the settings of the benchmark out of the real home directory
+_home = tempfile.TemporaryDirectory()
+os.environ["HOME"] = _home.name
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from asyncua import ua
+from asyncua.common.node import Node
+from asyncua.common.subscription import DataChangeNotif, SubscriptionItemData
+from asyncua.sync import SyncNode
+
+from PyQt5.QtWidgets import QApplication
+
+from uaclient.mainwindow import Window
+from uaclient.uaclient import NodeMetadata
+
+SIZES = (10, 100, 1000, 10000, 50000)
+UPDATES = 20000
+# notifications per frame
+BATCH = 100
+STAGES = ("decode", "log", "format", "stats", "queue", "apply")
+
+
+def notification(value):
+    item = ua.MonitoredItemNotification()
+    item.Value = ua.DataValue(ua.Variant(value, ua.VariantType.Double), SourceTimestamp=datetime.now(timezone.utc))
+    return DataChangeNotif(SubscriptionItemData(), item)
+
+
+def run(window, size):
+    ui = window.datachange_ui
+    ui.clear()
+    nodes = [SyncNode(None, Node(None, ua.NodeId(i, 2))) for i in range(size)]
+    for node in nodes:
+        metadata = NodeMetadata(node, "Node{}".format(node.nodeid.Identifier), ua.NodeId(11), ua.VariantType.Double)
+        ui.model.add_node(node, metadata.display_name)
+        ui._metadata[node.nodeid] = metadata
+        ui._register_node(metadata)
+    data = [notification(float(i)) for i in range(BATCH)]
+    handler = ui._subhandler
+    handler.stage_times.reset()
+    start = time.perf_counter()
+    for i in range(UPDATES):
+        handler.datachange_notification(nodes[i % size], float(i), data[i % BATCH])
+        if i % BATCH == BATCH - 1:
+            handler._emit_batch()  # one frame
+    elapsed = time.perf_counter() - start
+    window.duckdb_logger.flush()
+    return elapsed / UPDATES, handler.stage_times.snapshot()
+
+
+def main():
+    app = QApplication(sys.argv)
+    window = Window()
+    print("us per notification")
+    print("{:>8} {:>8}".format("nodes", "total") + "".join("{:>8}".format(stage) for stage in STAGES))
+    for size in SIZES:
+        total, stages = run(window, size)
+        line = "{:>8} {:>8.1f}".format(size, total * 1e6)
+        for stage in STAGES:
+            # apply is counted per changed row, it is spread over the notifications here
+            line += "{:>8.2f}".format(stages.get(stage, (0.0, 0))[0] / UPDATES * 1e6)
+        print(line)
+    window.close()
+
+
+if __name__ == "__main__":
+    main()
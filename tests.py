@@ -1,6 +1,17 @@
 
+import pickle
+import struct
 import unittest
 import sys
+import tempfile
+import threading
+import subprocess
+import time
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import duckdb
+import numpy as np
 print("SYS:PATH", sys.path)
 sys.path.insert(0, "python-opcua")
 sys.path.insert(0, "opcua-widgets")
@@ -9,12 +20,27 @@ print("PWD", os.getcwd())
 
 from opcua import ua
 from opcua import Server
+from asyncua import ua as aua
+from asyncua.ua import VariantType
+from asyncua.common.events import Event
+from asyncua.sync import Server as SyncServer, SyncNode
+from asyncua.common.node import Node
+from asyncua.common.subscription import DataChangeNotif, SubscriptionItemData
 
 from PyQt5.QtCore import QTimer, QSettings, QModelIndex, Qt, QCoreApplication
-from PyQt5.QtWidgets import QApplication
+from PyQt5.QtWidgets import QApplication, QTableView, QPushButton
 from PyQt5.QtTest import QTest
 
-from uaclient.mainwindow import Window
+from uaclient.mainwindow import Window, DataChangeHandler, StaticDataUI
+from uaclient.duckdb_logger import DuckDBLogger, event_record
+from uaclient.journal import Journal
+from uaclient.uaclient import UaClient, NodeMetadata
+from uaclient.subscription_model import SubscriptionModel
+from uaclient.node_stats import NodeStats
+from uaclient.subscription_sets import SubscriptionSets
+from uaclient.event_model import EventModel
+from uaclient.event_filter import EventFilterSettings
+from uaclient.graphwidget import ChannelBuffers, Poller
 
 
 class TestClient(unittest.TestCase):
@@ -23,13 +49,17 @@ class TestClient(unittest.TestCase):
         url = "opc.tcp://localhost:48400/freeopcua/server/"
         self.server.set_endpoint(url)
         self.server.start()
-        self.client = Window()
+        # keep the DuckDB file and its journal out of the home directory
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.client = Window(duckdb_path=os.path.join(self.tmpdir.name, "test.duckdb"))
         self.client.ui.addrComboBox.setCurrentText(url)
         self.client.connect()
 
     def tearDown(self):
         self.client.disconnect()
+        self.client.duckdb_logger.close()
         self.server.stop()
+        self.tmpdir.cleanup()
 
     def get_attr_value(self, text):
         idxlist = self.client.attrs_ui.model.match(self.client.attrs_ui.model.index(0, 0), Qt.DisplayRole, text,  1, Qt.MatchExactly | Qt.MatchRecursive)
@@ -59,6 +89,793 @@ class TestClient(unittest.TestCase):
         self.assertEqual(data, server_node.nodeid)
 
 
+class TestDuckDBLogger(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "test.duckdb")
+        self.logger = DuckDBLogger(batch_size=100, flush_interval=0.05)
+        self.logger.connect(self.path)
+
+    def tearDown(self):
+        self.logger.close()
+        self.tmpdir.cleanup()
+
+    def query(self, sql):
+        return self.logger.query(sql)
+
+    def test_batched_writes(self):
+        key = self.logger.register_node("ns=2;i=1", "Temp", "Double", "opc.tcp://localhost:4840")
+        for i in range(250):
+            self.logger.log_data(key, float(i), VariantType.Double, datetime.now())
+        self.logger.flush()
+        self.assertEqual(self.query("SELECT count(*) FROM opcua_logs")[0][0], 250)
+
+    def test_typed_values(self):
+        now = datetime.now()
+        for i, (name, value, vtype) in enumerate([
+            ("Temp", 21.5, VariantType.Double),
+            ("Count", 42, VariantType.UInt32),
+            ("On", True, VariantType.Boolean),
+            ("Name", "pump", VariantType.String),
+            ("Nulls", None, VariantType.Int32),
+            ("Off", None, VariantType.Boolean),
+        ]):
+            key = self.logger.register_node("ns=2;i={}".format(i), name, vtype.name, "srv")
+            self.logger.log_data(key, value, vtype, now)
+        self.logger.flush()
+        rows = self.query("SELECT value_double, value_bigint, value_bool, value_varchar, data_type FROM opcua_logs ORDER BY node_id")
+        self.assertEqual(rows, [
+            (21.5, None, None, None, "Double"),
+            (None, 42, None, None, "UInt32"),
+            (None, None, True, None, "Boolean"),
+            (None, None, None, "pump", "String"),
+            (None, None, None, None, "Int32"),
+            (None, None, None, None, "Boolean"),
+        ])
+
+    def test_timestamps_and_status(self):
+        key = self.logger.register_node("ns=2;i=1", "Temp", "Double", "srv")
+        utc = aua.FILETIME_EPOCH_AS_UTC_DATETIME.tzinfo
+        source = datetime(2024, 5, 1, 12, 0, 0, 100000, tzinfo=utc)
+        server = datetime(2024, 5, 1, 12, 0, 0, 150000, tzinfo=utc)
+        received = datetime(2024, 5, 1, 12, 0, 0, 400000, tzinfo=utc)
+        self.logger.log_data(key, 1.0, VariantType.Double, source, server, received, aua.StatusCodes.Good)
+        self.logger.log_data(key, 2.0, VariantType.Double, None, server, received, aua.StatusCodes.BadOutOfService)
+        self.logger.flush()
+        rows = self.query("""
+            SELECT timestamp, source_timestamp, epoch_ms(receive_timestamp) - epoch_ms(server_timestamp), status_code
+            FROM opcua_logs ORDER BY value_double
+        """)
+        self.assertEqual(rows, [
+            (datetime(2024, 5, 1, 12, 0, 0, 100000), datetime(2024, 5, 1, 12, 0, 0, 100000), 250, 0),
+            (datetime(2024, 5, 1, 12, 0, 0, 150000), None, 250, aua.StatusCodes.BadOutOfService),
+        ])
+
+    def test_node_keys(self):
+        key = self.logger.register_node("ns=2;i=1", "Temp", "Double", "srv")
+        self.assertEqual(key, self.logger.register_node("ns=2;i=1", "Temp", "Double", "srv"))
+        self.assertNotEqual(key, self.logger.register_node("ns=2;i=1", "Temp", "Double", "other"))
+        self.logger.log_data(key, 1.0, VariantType.Double, datetime.now())
+        self.logger.close()
+        self.logger.connect(self.path)
+        self.assertEqual(key, self.logger.register_node("ns=2;i=1", "Temp", "Double", "srv"))
+        self.assertEqual(self.query("SELECT display_name, node_id, server FROM opcua_logs"), [("Temp", "ns=2;i=1", "srv")])
+
+    def test_node_keys_survive_file_switch(self):
+        other_path = os.path.join(self.tmpdir.name, "other.duckdb")
+        other = DuckDBLogger(flush_interval=0.05)
+        other.connect(other_path)
+        self.assertEqual(other.register_node("ns=2;i=2", "Level", "Double", "srv"), 1)
+        other.close()
+        key = self.logger.register_node("ns=2;i=1", "Temp", "Double", "srv")
+        self.logger.close()
+        # the client keeps logging with the key of the first file while the logger switches
+        self.logger.log_data(key, 1.0, VariantType.Double, datetime.now())
+        self.logger.connect(other_path)
+        self.logger.log_data(key, 2.0, VariantType.Double, datetime.now())
+        level_key = self.logger.register_node("ns=2;i=2", "Level", "Double", "srv")
+        self.assertNotEqual(level_key, key)
+        self.logger.log_data(level_key, 3.0, VariantType.Double, datetime.now())
+        self.logger.flush()
+        self.assertEqual(self.query("SELECT display_name, value_double FROM opcua_logs ORDER BY value_double"),
+                         [("Temp", 1.0), ("Temp", 2.0), ("Level", 3.0)])
+        self.assertEqual(self.logger.register_node("ns=2;i=1", "Temp", "Double", "srv"), key)
+        self.assertEqual(self.query("SELECT display_name FROM nodes ORDER BY node_key"), [("Level",), ("Temp",)])
+
+    def test_migrate_legacy_values(self):
+        self.logger.close()
+        path = os.path.join(self.tmpdir.name, "legacy.duckdb")
+        conn = duckdb.connect(path)
+        conn.execute("CREATE TABLE opcua_logs (timestamp TIMESTAMP, display_name VARCHAR, node_id VARCHAR, value VARCHAR, data_type VARCHAR, server VARCHAR)")
+        now = datetime(2024, 5, 1, 12)
+        conn.executemany("INSERT INTO opcua_logs VALUES (?, ?, ?, ?, ?, 'srv')", [
+            (now, "Temp", "ns=2;i=1", "21.5", "VariantType.Double"),
+            (now, "Count", "ns=2;i=2", "42", "7"),
+            (now, "On", "ns=2;i=3", "True", "VariantType.Boolean"),
+            (now, "Name", "ns=2;i=4", "pump", "VariantType.String"),
+            (now, "Broken", "ns=2;i=5", "n/a", "VariantType.Double"),
+            (now, "Unknown", "ns=2;i=6", "7", None),
+        ])
+        conn.close()
+        self.logger.connect(path)
+        rows = self.query("SELECT value_double, value_bigint, value_bool, value_varchar FROM opcua_logs ORDER BY node_id")
+        self.assertEqual(rows, [
+            (21.5, None, None, None),
+            (None, 42, None, None),
+            (None, None, True, None),
+            (None, None, None, "pump"),
+            (None, None, None, "n/a"),
+            (None, None, None, "7"),
+        ])
+
+    def test_failed_migration_is_retried(self):
+        self.logger.close()
+        path = os.path.join(self.tmpdir.name, "legacy.duckdb")
+        conn = duckdb.connect(path)
+        conn.execute("CREATE TABLE opcua_logs (timestamp TIMESTAMP, value VARCHAR)")
+        conn.close()
+        self.logger = DuckDBLogger(flush_interval=0.05, retry_interval=0.1)
+        self.logger.connect(path)
+        self.assertFalse(self.logger.check_if_open())
+        key = self.logger.register_node("ns=2;i=1", "Temp", "Double", "srv")
+        self.logger.log_data(key, 1.0, VariantType.Double, datetime.now())
+        self.logger.flush(timeout=5)
+        self.assertTrue(self.logger._writer.is_alive())
+        # the migration was rolled back and the file closed, it can be repaired and is opened again
+        for _ in range(50):
+            try:
+                conn = duckdb.connect(path)
+                break
+            except duckdb.IOException:
+                threading.Event().wait(0.05)
+        self.assertEqual(conn.execute("SELECT count(*) FROM information_schema.tables WHERE table_name = 'opcua_logs'").fetchone()[0], 1)
+        for column in ("display_name", "node_id", "data_type", "server"):
+            conn.execute("ALTER TABLE opcua_logs ADD COLUMN {} VARCHAR".format(column))
+        conn.close()
+        for _ in range(50):
+            self.logger.flush()
+            if self.logger.check_if_open() and self.query("SELECT count(*) FROM opcua_logs")[0][0] == 1:
+                break
+            threading.Event().wait(0.1)
+        self.assertEqual(self.query("SELECT display_name, value_double FROM opcua_logs"), [("Temp", 1.0)])
+
+    def test_parquet_rotation(self):
+        self.logger.rotation_dir = os.path.join(self.tmpdir.name, "parquet")
+        key = self.logger.register_node("ns=2;i=1", "Temp", "Double", "opc.tcp://localhost:4840")
+        now = datetime(2024, 5, 1, 12, 30)
+        self.logger.log_data(key, 1.0, VariantType.Double, now - timedelta(hours=2))
+        self.logger.log_data(key, 2.0, VariantType.Double, now)
+        self.assertEqual(self.logger.rotate(datetime(2024, 5, 1, 12)), 1)
+        self.assertTrue(os.path.isdir(os.path.join(
+            self.logger.rotation_dir, "server=opc.tcp_localhost_4840", "date=2024-05-01", "hour=10")))
+        self.assertEqual(self.query("SELECT value_double FROM opcua_logs"), [(2.0,)])
+        rows = self.query("SELECT value_double, server FROM opcua_logs_history ORDER BY timestamp")
+        self.assertEqual(rows, [(1.0, "opc.tcp://localhost:4840"), (2.0, "opc.tcp://localhost:4840")])
+        self.assertEqual(self.query("SELECT count(*) FROM opcua_logs_history WHERE hour = 10")[0][0], 1)
+
+    def test_rollups(self):
+        key = self.logger.register_node("ns=2;i=1", "Temp", "Double", "srv")
+        start = datetime(2024, 5, 1, 12, 0, 0)
+        for i, value in enumerate([3.0, 1.0, 5.0]):
+            self.logger.log_data(key, value, VariantType.Double, start + timedelta(milliseconds=300 * i))
+            self.logger.flush()  # every sample in its own batch, the rollup is merged incrementally
+        rows = self.query("SELECT bucket, count, min, max, avg, first, last FROM opcua_rollup_1s")
+        self.assertEqual(rows, [(start, 3, 1.0, 5.0, 3.0, 3.0, 5.0)])
+        self.assertEqual(self.query("SELECT count, min, max, avg, first, last FROM opcua_rollup_1h"), [(3, 1.0, 5.0, 3.0, 3.0, 5.0)])
+        self.logger._call(lambda: self.logger._expire_rollups(start + timedelta(days=3)))
+        self.assertEqual(self.query("SELECT count(*) FROM opcua_rollup_1s")[0][0], 0)
+        self.assertEqual(self.query("SELECT count(*) FROM opcua_rollup_1h")[0][0], 1)
+
+    def test_concurrent_readers(self):
+        key = self.logger.register_node("ns=2;i=1", "Temp", "Double", "srv")
+        counts = []
+
+        def read():
+            cursor = self.logger.cursor()
+            for _ in range(20):
+                counts.append(cursor.execute("SELECT count(*) FROM opcua_logs").fetchone()[0])
+            cursor.close()
+
+        reader = threading.Thread(target=read)
+        reader.start()
+        for i in range(1000):
+            self.logger.log_data(key, float(i), VariantType.Double, datetime.now())
+        reader.join()
+        self.logger.flush()
+        self.assertEqual(counts, sorted(counts))
+        self.assertEqual(self.query("SELECT count(*) FROM opcua_logs")[0][0], 1000)
+
+    def test_tail_since_watermark(self):
+        key = self.logger.register_node("ns=2;i=1", "Temp", "Double", "srv")
+        for i in range(5):
+            self.logger.log_data(key, float(i), VariantType.Double, datetime.now())
+        self.logger.flush()
+        rows = self.logger.get_data_since(None, limit=3)
+        self.assertEqual([row[4] for row in rows], ["4.0", "3.0", "2.0"])
+        self.assertEqual(self.logger.get_data_since(rows[0][0]), [])
+        self.logger.log_data(key, 5.0, VariantType.Double, datetime.now())
+        self.logger.flush()
+        rows = self.logger.get_data_since(rows[0][0])
+        self.assertEqual([(row[2], row[4]) for row in rows], [("Temp", "5.0")])
+
+    def test_structured_events(self):
+        event = Event.from_field_dict({
+            "EventId": aua.Variant(b"\x01\x02", aua.VariantType.ByteString),
+            "EventType": aua.Variant(aua.NodeId(2041), aua.VariantType.NodeId),
+            "SourceNode": aua.Variant(aua.NodeId(2253), aua.VariantType.NodeId),
+            "SourceName": aua.Variant("Server", aua.VariantType.String),
+            "Severity": aua.Variant(500, aua.VariantType.UInt16),
+            "Time": aua.Variant(datetime(2024, 5, 1, 12), aua.VariantType.DateTime),
+            "Message": aua.Variant(aua.LocalizedText("Tank overflow"), aua.VariantType.LocalizedText),
+        })
+        self.logger.log_event(event_record(event), datetime.now(), "srv")
+        self.logger.flush()
+        rows = self.query("SELECT event_type, source_node, source_name, severity, time, message, fields->>'EventId' FROM opcua_event_logs")
+        self.assertEqual(rows, [("i=2041", "i=2253", "Server", 500, datetime(2024, 5, 1, 12), "Tank overflow", "0102")])
+
+    def test_journal_while_locked(self):
+        self.logger.close()
+        # another process holds the lock on the file
+        holder = subprocess.Popen(
+            [sys.executable, "-c", "import duckdb, sys, time; c = duckdb.connect(sys.argv[1]); print('locked', flush=True); time.sleep(60)", self.path],
+            stdout=subprocess.PIPE, text=True)
+        try:
+            self.assertEqual(holder.stdout.readline().strip(), "locked")
+            self.logger = DuckDBLogger(flush_interval=0.05, retry_interval=0.1, fsync_policy="always")
+            self.logger.connect(self.path)
+            self.assertFalse(self.logger.check_if_open())
+            key = self.logger.register_node("ns=2;i=1", "Temp", "Double", "srv")
+            for i in range(10):
+                self.logger.log_data(key, float(i), VariantType.Double, datetime.now())
+            # structures loaded with load_data_type_definitions have exec generated classes, which cannot be pickled
+            namespace = {}
+            exec("from dataclasses import dataclass\n@dataclass\nclass Point:\n    x: float = 0.0\n    y: float = 0.0\n", namespace)
+            point_key = self.logger.register_node("ns=2;i=2", "Point", "Point", "srv")
+            self.logger.log_data(point_key, namespace["Point"](1.0, 2.0), VariantType.ExtensionObject, datetime.now())
+            self.logger.flush()
+            self.assertGreater(os.path.getsize(self.path + ".journal"), 0)
+            self.assertEqual(self.logger.dropped, 0)
+        finally:
+            holder.kill()
+            holder.wait()
+        for _ in range(50):
+            if self.logger.check_if_open():
+                break
+            threading.Event().wait(0.1)
+        self.logger.log_data(key, 10.0, VariantType.Double, datetime.now())
+        for _ in range(50):
+            self.logger.flush()
+            if self.query("SELECT count(*) FROM opcua_logs")[0][0] == 12:
+                break
+            threading.Event().wait(0.1)
+        self.assertEqual(self.query("SELECT count(*), max(value_double) FROM opcua_logs WHERE display_name = 'Temp'")[0], (11, 10.0))
+        self.assertEqual(self.query("SELECT value_varchar FROM opcua_logs WHERE display_name = 'Point'"), [("Point(x=1.0, y=2.0)",)])
+        self.assertEqual(self.logger.register_node("ns=2;i=1", "Temp", "Double", "srv"), 1)
+
+    def test_journal_ignores_truncated_record(self):
+        path = os.path.join(self.tmpdir.name, "test.journal")
+        journal = Journal(path, fsync_policy="never")
+        journal.append([("opcua_event_logs", (1, 2, 3))])
+        journal.append([("opcua_event_logs", (4, 5, 6))])
+        journal.close()
+        with open(path, "r+b") as f:
+            f.truncate(os.path.getsize(path) - 1)
+        journal = Journal(path)
+        self.assertTrue(journal.pending)
+        self.assertEqual(journal.take(), [("opcua_event_logs", (1, 2, 3))])
+        journal.done()
+        self.assertFalse(journal.pending)
+        self.assertFalse(os.path.exists(path + ".replay"))
+
+    def test_journal_shared_by_processes(self):
+        path = os.path.join(self.tmpdir.name, "test.journal")
+        # another process logging to the same database keeps its journal open
+        other = Journal(path, fsync_policy="never")
+        owner = Journal(path, fsync_policy="never")
+        other.append([("opcua_event_logs", (1, 2, 3))])
+        self.assertTrue(owner.pending)
+        self.assertEqual(owner.take(), [("opcua_event_logs", (1, 2, 3))])
+        other.append([("opcua_event_logs", (4, 5, 6))])
+        owner.done()
+        self.assertTrue(owner.pending)
+        self.assertEqual(owner.take(), [("opcua_event_logs", (4, 5, 6))])
+        owner.done()
+        self.assertFalse(owner.pending)
+        other.close()
+
+    def test_dead_letter_bad_rows(self):
+        key = self.logger.register_node("ns=2;i=1", "Temp", "Double", "srv")
+        for i in range(50):
+            self.logger.log_data(key, float(i), VariantType.Double, datetime.now())
+        # a status code that does not fit its UINTEGER column fails the whole batch
+        self.logger.log_data(key, 50.0, VariantType.Double, datetime.now(), status_code=-1)
+        self.logger.flush()
+        self.assertEqual(self.query("SELECT count(*) FROM opcua_logs")[0][0], 50)
+        self.assertFalse(self.logger._journal.pending)
+        dead = Journal(self.path + ".journal").dead_letter_path
+        rows = [row for payload in Journal._read(dead) for row in pickle.loads(payload)]
+        # rows are kept as the column values they were inserted with: node, timestamps, status_code, values
+        self.assertEqual([(table, row[0][0], row[4], row[5]) for table, row in rows], [("opcua_samples", "ns=2;i=1", -1, 50.0)])
+
+    def test_journal_dead_letters_unreadable_record(self):
+        path = os.path.join(self.tmpdir.name, "test.journal")
+        journal = Journal(path, fsync_policy="never")
+        journal.append([("opcua_event_logs", (1, 2, 3))])
+        journal.close()
+        with open(path, "ab") as f:
+            f.write(struct.pack("<I", 4) + b"junk")
+        journal.append([("opcua_event_logs", (4, 5, 6))])
+        self.assertEqual(journal.take(), [("opcua_event_logs", (1, 2, 3)), ("opcua_event_logs", (4, 5, 6))])
+        journal.done()
+        self.assertEqual(list(Journal._read(journal.dead_letter_path)), [b"junk"])
+        journal.append([("opcua_event_logs", (7, 8, 9))])
+        self.assertEqual(journal.take(), [("opcua_event_logs", (7, 8, 9))])
+
+    def test_flush_on_close(self):
+        event = Event.from_field_dict({"Severity": aua.Variant(100, aua.VariantType.UInt16)})
+        self.logger.log_event(event_record(event), datetime.now(), "opc.tcp://localhost:4840")
+        self.logger.close()
+        self.logger.connect(self.path)
+        self.assertEqual(self.query("SELECT count(*) FROM opcua_event_logs")[0][0], 1)
+
+
+class TestStaticDataUI(unittest.TestCase):
+    def setUp(self):
+        self.app = QApplication.instance() or QApplication(sys.argv)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.logger = DuckDBLogger(flush_interval=0.05)
+        self.logger.connect(os.path.join(self.tmpdir.name, "test.duckdb"))
+        self.key = self.logger.register_node("ns=2;i=1", "Temp", "Double", "srv")
+        window = SimpleNamespace(ui=SimpleNamespace(staticDataView=QTableView(), buttonRefresh=QPushButton()))
+        self.static_ui = StaticDataUI(window, self.logger)
+        self.static_ui.timer.stop()
+        self.static_ui.max_rows = 3
+
+    def tearDown(self):
+        self.logger.close()
+        self.tmpdir.cleanup()
+
+    def log(self, values):
+        for value in values:
+            self.logger.log_data(self.key, value, VariantType.Double, datetime.now())
+        self.logger.flush()
+        self.static_ui.refresh()
+
+    def values(self):
+        return [self.static_ui.model.item(row, 3).text() for row in range(self.static_ui.model.rowCount())]
+
+    def test_keeps_newest_rows_when_sorted(self):
+        self.log([5.0, 1.0, 3.0])
+        # sorted by value, the oldest row is not the last one
+        self.static_ui.window.ui.staticDataView.sortByColumn(3, Qt.AscendingOrder)
+        self.assertEqual(self.values(), ["1.0", "3.0", "5.0"])
+        self.log([4.0, 2.0])
+        self.assertEqual(self.values(), ["2.0", "3.0", "4.0"])
+
+
+class TestDataChangeHandler(unittest.TestCase):
+    def setUp(self):
+        self.app = QApplication.instance() or QApplication(sys.argv)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.logger = DuckDBLogger(batch_size=100, flush_interval=0.05)
+        self.logger.connect(os.path.join(self.tmpdir.name, "test.duckdb"))
+
+    def tearDown(self):
+        self.logger.close()
+        self.tmpdir.cleanup()
+
+    def notification(self, value, source_timestamp=None):
+        item = aua.MonitoredItemNotification()
+        item.Value = aua.DataValue(aua.Variant(value, VariantType.Double), SourceTimestamp=source_timestamp)
+        return DataChangeNotif(SubscriptionItemData(), item)
+
+    def test_one_batch_per_frame(self):
+        nodes = [SyncNode(None, Node(None, aua.NodeId(i, 2))) for i in range(4)]
+        metadata = {}
+        for node in nodes:
+            meta = metadata[node.nodeid] = NodeMetadata(node, "Node", aua.NodeId(11), VariantType.Double)
+            meta.node_key = self.logger.register_node(meta.node_id, meta.display_name, "Double", "srv")
+        handler = DataChangeHandler(metadata, frame_rate=1000)
+        handler.logger = self.logger
+        batches = []
+        handler.data_changes_fired.connect(batches.append)
+        threads = [
+            threading.Thread(target=lambda node=node: [
+                handler.datachange_notification(node, float(i), self.notification(float(i))) for i in range(500)])
+            for node in nodes
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        QTest.qWait(50)
+        # one ready to display batch with the latest value of each node, every value is logged
+        self.assertEqual(len(batches), 1)
+        self.assertEqual({nodeid: value for nodeid, (value, _) in batches[0].items()},
+                         {node.nodeid: "499.0" for node in nodes})
+        self.logger.flush()
+        self.assertEqual(self.logger.query("SELECT count(*) FROM opcua_logs")[0][0], 2000)
+        self.assertEqual(handler.stage_times.snapshot()["decode"][1], 2000)
+
+    def test_graph_channel(self):
+        node = SyncNode(None, Node(None, aua.NodeId(1, 2)))
+        metadata = {node.nodeid: NodeMetadata(node, "Node", aua.NodeId(11), VariantType.Double)}
+        handler = DataChangeHandler(metadata, frame_rate=1000)
+        channel = metadata[node.nodeid].channel = ChannelBuffers(3).add_channel()
+        start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+        for i, value in enumerate((1.0, 2.0, None, 3.0, 4.0)):
+            handler.datachange_notification(node, value, self.notification(value or 0.0, start + timedelta(seconds=i)))
+        times, values = channel.samples()
+        self.assertEqual(list(values), [2.0, 3.0, 4.0])
+        # plotted against the source timestamps
+        self.assertEqual(list(times - start.timestamp()), [1.0, 3.0, 4.0])
+
+    def test_stats(self):
+        node = SyncNode(None, Node(None, aua.NodeId(1, 2)))
+        metadata = {node.nodeid: NodeMetadata(node, "Node", aua.NodeId(11), VariantType.Double)}
+        handler = DataChangeHandler(metadata, frame_rate=1000)
+        batches = []
+        handler.data_changes_fired.connect(batches.append)
+        handler.datachange_notification(node, 1.0, self.notification(1.0))
+        handler.show_stats = True
+        for value in (4.0, 2.0):
+            handler.datachange_notification(node, value, self.notification(value))
+        QTest.qWait(50)
+        value, _, (rate, low, high, mean, interval, latency) = batches[0][node.nodeid]
+        self.assertEqual((value, low, high, mean), ("2.0", "2", "4", "3.8"))
+        self.assertEqual(metadata[node.nodeid].stats.count, 2)
+        self.assertTrue(interval.endswith(" s"))
+        # the notifications carry no source timestamp
+        self.assertEqual(latency, "")
+
+
+class TestSubscriptionModel(unittest.TestCase):
+    def setUp(self):
+        self.model = SubscriptionModel()
+        self.nodes = [SyncNode(None, Node(None, aua.NodeId(i, 2))) for i in range(5)]
+        for node in self.nodes:
+            self.model.add_node(node, "Node{}".format(node.nodeid.Identifier))
+
+    def column(self, column):
+        return [self.model.index(row, column).data() for row in range(self.model.rowCount())]
+
+    def test_remove_keeps_rows_in_sync(self):
+        self.model.remove_node(self.nodes[1].nodeid)
+        self.assertEqual(self.column(0), ["Node0", "Node2", "Node3", "Node4"])
+        self.assertEqual(self.model.row(self.nodes[4].nodeid), 3)
+        self.assertEqual(self.model.node(1), self.nodes[2])
+        self.model.update({self.nodes[4].nodeid: ("4.0", "now")})
+        self.assertEqual(self.column(1), ["No Data yet", "No Data yet", "No Data yet", "4.0"])
+
+    def test_one_data_changed_per_batch(self):
+        changed = []
+        self.model.dataChanged.connect(lambda first, last, roles: changed.append((first.row(), last.row())))
+        self.model.update({self.nodes[3].nodeid: ("3.0", "t3"), self.nodes[1].nodeid: ("1.0", "t1")})
+        self.assertEqual(changed, [(1, 3)])
+        self.assertEqual(self.column(2), ["", "t1", "", "t3", ""])
+
+    def test_stats_columns(self):
+        stats = ("1.00", "0", "2", "1", "0.500 s", "0.010 s")
+        self.model.update({self.nodes[2].nodeid: ("2.0", "t2", stats)})
+        column = self.model.STATS_COLUMN
+        self.assertEqual([self.model.index(2, column + i).data() for i in range(len(stats))], list(stats))
+        self.assertEqual(self.column(column + 4), ["", "", "0.500 s", "", ""])
+        self.model.clear_stats()
+        self.assertEqual(self.column(column), [""] * 5)
+
+
+class TestEventModel(unittest.TestCase):
+    def rows(self, numbers):
+        return [(str(i), "500", "Source", "i=2041", "Event {}".format(i)) for i in numbers]
+
+    def messages(self, model):
+        return [model.index(row, 4).data() for row in range(model.rowCount())]
+
+    def test_ring_buffer(self):
+        model = EventModel(capacity=5)
+        removed = []
+        model.rowsRemoved.connect(lambda parent, first, last: removed.append((first, last)))
+        model.add_rows(self.rows(range(3)))
+        model.add_rows(self.rows(range(3, 7)))
+        # the two oldest rows make room in one removal
+        self.assertEqual(removed, [(0, 1)])
+        self.assertEqual(self.messages(model), ["Event {}".format(i) for i in range(2, 7)])
+        model.add_rows(self.rows(range(7, 19)))
+        self.assertEqual(self.messages(model), ["Event {}".format(i) for i in range(14, 19)])
+        model.add_rows(self.rows([19]))
+        self.assertEqual(model.rowCount(), 5)
+        self.assertEqual(model.index(4, 0).data(), "19")
+        model.clear()
+        self.assertEqual(model.rowCount(), 0)
+
+
+class TestEventFilter(unittest.TestCase):
+    def test_default_selects_every_field(self):
+        evfilter = EventFilterSettings().to_event_filter()
+        self.assertEqual(len(evfilter.SelectClauses), 9)
+        self.assertEqual(evfilter.WhereClause.Elements, [])
+
+    def test_where_clause(self):
+        settings = EventFilterSettings(["Message"], aua.NodeId(aua.ObjectIds.AlarmConditionType), 500,
+                                       aua.NodeId("Pump", 2))
+        evfilter = settings.to_event_filter()
+        self.assertEqual([op.BrowsePath[0].Name for op in evfilter.SelectClauses], ["Message"])
+        elements = evfilter.WhereClause.Elements
+        self.assertEqual([el.FilterOperator for el in elements], [
+            aua.FilterOperator.And, aua.FilterOperator.OfType, aua.FilterOperator.And,
+            aua.FilterOperator.GreaterThanOrEqual, aua.FilterOperator.Equals])
+        self.assertEqual([op.Index for op in elements[0].FilterOperands], [1, 2])
+        self.assertEqual([op.Index for op in elements[2].FilterOperands], [3, 4])
+        self.assertEqual(elements[3].FilterOperands[1].Value.Value, 500)
+        self.assertEqual(elements[4].FilterOperands[1].Value.Value, aua.NodeId("Pump", 2))
+
+
+class TestChannelBuffers(unittest.TestCase):
+    start = datetime(2024, 5, 1, tzinfo=timezone.utc)
+
+    def append(self, channel, second, value):
+        channel.append(self.start + timedelta(seconds=second), value)
+
+    def values(self, channel):
+        return list(channel.samples()[1])
+
+    def test_ring(self):
+        buffers = ChannelBuffers(4, rows=2)
+        channels = [buffers.add_channel() for _ in range(3)]
+        for i in range(10):
+            self.append(channels[0], i, i)
+        self.append(channels[2], 0.5, 7)
+        self.assertEqual(self.values(channels[0]), [6.0, 7.0, 8.0, 9.0])
+        self.assertEqual(self.values(channels[1]), [])
+        self.assertEqual(self.values(channels[2]), [7.0])
+        # channels keep their own timestamps, naive ones are UTC
+        channels[1].append(datetime(2024, 5, 1, 0, 0, 2), 1)
+        self.assertEqual(list(channels[1].samples()[0]), [self.start.timestamp() + 2])
+        self.assertEqual(list(channels[2].samples()[0]), [self.start.timestamp() + 0.5])
+        # views on the buffers, appending allocates nothing
+        times, values = channels[0].samples()
+        self.assertTrue(np.shares_memory(times, buffers._times) and np.shares_memory(values, buffers._values))
+        buffers.remove_channel(channels[1])
+        self.append(channels[1], 1, 1)
+        self.assertEqual(self.values(buffers.add_channel()), [])
+
+    def test_resize(self):
+        buffers = ChannelBuffers(4)
+        channel = buffers.add_channel()
+        for i in range(6):
+            self.append(channel, i, i)
+        buffers.resize(3)
+        self.assertEqual(self.values(channel), [3.0, 4.0, 5.0])
+        buffers.resize(5)
+        self.append(channel, 6, 6)
+        self.assertEqual(self.values(channel), [3.0, 4.0, 5.0, 6.0])
+        for i in range(7, 9):
+            self.append(channel, i, i)
+        self.assertEqual(self.values(channel), [4.0, 5.0, 6.0, 7.0, 8.0])
+        self.assertEqual(list(channel.samples()[0] - self.start.timestamp()), [4.0, 5.0, 6.0, 7.0, 8.0])
+
+    def test_snapshot(self):
+        buffers = ChannelBuffers(4)
+        channel = buffers.add_channel()
+        for i in range(4):
+            self.append(channel, i, i)
+        times, values = channel.snapshot()
+        self.append(channel, 4, 4)
+        # the drawn arrays stay sorted while the full ring overwrites its oldest sample
+        self.assertEqual(list(times - self.start.timestamp()), [0.0, 1.0, 2.0, 3.0])
+        self.assertEqual(list(values), [0.0, 1.0, 2.0, 3.0])
+        self.assertFalse(np.shares_memory(times, buffers._times))
+        self.assertEqual(list(channel.snapshot()[1]), [1.0, 2.0, 3.0, 4.0])
+        buffers.resize(2)
+        self.assertEqual(list(channel.snapshot()[1]), [3.0, 4.0])
+
+
+class TestNodeStats(unittest.TestCase):
+    def test_incremental(self):
+        stats = NodeStats(alpha=0.5, rate_window=10.0)
+        for i, value in enumerate((2.0, 6.0, -1.0, True, "text", float("nan"))):
+            stats.add(value, 100.0 + i * 0.5, latency=0.01)
+        self.assertEqual((stats.count, stats.min, stats.max), (6, -1.0, 6.0))
+        # 2 -> 4 -> 1.5 -> 1.25, the string and NaN leave the mean alone
+        self.assertEqual(stats.mean, 1.25)
+        self.assertEqual((stats.interval, stats.latency), (0.5, 0.01))
+
+    def test_rate(self):
+        stats = NodeStats(rate_window=5.0)
+        self.assertEqual(stats.rate, 0.0)
+        for i in range(201):
+            stats.add(float(i), i * 0.1)
+        self.assertAlmostEqual(stats.rate, 10.0, delta=0.3)
+        self.assertEqual(stats.texts()[0], "{:.2f}".format(stats.rate))
+
+
+class TestSubscriptionSets(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.sets = SubscriptionSets(os.path.join(self.tmpdir.name, "sets.json"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_save_and_load(self):
+        metadata = []
+        for nodeid, variant_type in ((aua.NodeId(7, 1), VariantType.Double), (aua.NodeId("Tag", 2), None),
+                                     (aua.NodeId(9, 3), VariantType.Int32)):
+            meta = NodeMetadata(SyncNode(None, Node(None, nodeid)), "Node", aua.NodeId(3001, 2), variant_type)
+            meta.publishing_interval, meta.sampling_interval, meta.queue_size = 100, 50.0, 10
+            metadata.append(meta)
+        self.sets.save("line", metadata, ["http://opcfoundation.org/UA/", "urn:a", "urn:b", "urn:gone"])
+        self.assertEqual(self.sets.names(), ["line"])
+        # the server now has its namespaces in another order
+        loaded, missing = self.sets.load("line", ["http://opcfoundation.org/UA/", "urn:b", "urn:a"],
+                                         lambda nodeid: SyncNode(None, Node(None, nodeid)))
+        self.assertEqual([meta.nodeid for meta in loaded], [aua.NodeId(7, 2), aua.NodeId("Tag", 1)])
+        self.assertEqual(missing, ["ns=3;i=9"])
+        self.assertEqual(loaded[0].variant_type, VariantType.Double)
+        self.assertEqual(loaded[1].data_type, aua.NodeId(3001, 1))
+        self.assertEqual((loaded[1].publishing_interval, loaded[1].sampling_interval, loaded[1].queue_size),
+                         (100, 50.0, 10))
+        self.sets.remove("line")
+        self.assertEqual(self.sets.names(), [])
+
+
+class TestUaClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = SyncServer()
+        cls.url = "opc.tcp://127.0.0.1:48410/freeopcua/server/"
+        cls.server.set_endpoint(cls.url)
+        idx = cls.server.register_namespace("urn:test")
+        objects = cls.server.nodes.objects
+        cls.temp = objects.add_variable(idx, "Temp", 1.5)
+        cls.count = objects.add_variable(idx, "Count", aua.Variant(3, VariantType.UInt32))
+        cls.duration = objects.add_variable(idx, "Duration", 1.0, datatype=aua.NodeId(aua.ObjectIds.Duration))
+        cls.timeouts = [objects.add_variable(idx, "Timeout{}".format(i), 1.0, datatype=aua.NodeId(aua.ObjectIds.Duration))
+                        for i in range(5)]
+        cls.machine = objects.add_object(idx, "Machine")
+        axis = cls.machine.add_object(idx, "Axis")
+        cls.tags = [cls.machine.add_variable(idx, "Tag{}".format(i), float(i)) for i in range(20)]
+        cls.tags += [axis.add_variable(idx, "Position{}".format(i), float(i)) for i in range(5)]
+        # properties of a variable are not subscribed with it
+        cls.tags[0].add_property(idx, "EngineeringUnits", "mm")
+        cls.tags[0].add_property(idx, "EURange", "0..100")
+        cls.server.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.uaclient = UaClient()
+        self.uaclient.connect(self.url)
+
+    def tearDown(self):
+        self.uaclient.disconnect()
+
+    def test_read_node_metadata(self):
+        nodes = [self.uaclient.get_node(node.nodeid) for node in (self.temp, self.count, self.duration)]
+        nodes.append(self.uaclient.get_node(aua.ObjectIds.ObjectsFolder))
+        metadata = self.uaclient.read_node_metadata(nodes)
+        self.assertEqual([m.display_name for m in metadata], ["Temp", "Count", "Duration", "Objects"])
+        self.assertEqual([m.data_type_name for m in metadata], ["Double", "UInt32", "Double", None])
+        self.assertEqual(metadata[0].node_id, self.temp.nodeid.to_string())
+
+    def test_derived_data_type_resolved_once(self):
+        resolved = []
+        variant_type = self.uaclient._variant_type
+        self.uaclient._variant_type = lambda data_type: resolved.append(data_type) or variant_type(data_type)
+        nodes = [self.uaclient.get_node(node.nodeid) for node in [self.duration] + self.timeouts]
+        metadata = self.uaclient.read_node_metadata(nodes)
+        self.assertEqual({m.data_type_name for m in metadata}, {"Double"})
+        self.assertEqual(resolved, [aua.NodeId(aua.ObjectIds.Duration)])
+
+    def test_browse_variables(self):
+        self.uaclient._operation_limits["MaxNodesPerBrowse"] = 1
+        variables = self.uaclient.browse_variables([self.uaclient.get_node(self.machine.nodeid)])
+        self.assertEqual({node.nodeid for node in variables}, {node.nodeid for node in self.tags})
+
+    def test_bulk_subscribe(self):
+        notified = set()
+
+        class Handler:
+            def datachange_notification(self, node, val, data):
+                notified.add(node.nodeid)
+
+        self.uaclient._operation_limits["MaxMonitoredItemsPerCall"] = 7
+        missing = self.uaclient.get_node(aua.NodeId(9999, 2))
+        nodes = [self.uaclient.get_node(node.nodeid) for node in self.tags] + [missing]
+        results = self.uaclient.subscribe_datachange_nodes(nodes, Handler())
+        self.assertIsInstance(results[missing.nodeid], aua.StatusCode)
+        self.assertEqual(sum(isinstance(handle, int) for handle in results.values()), len(self.tags))
+        for _ in range(50):
+            if len(notified) == len(self.tags):
+                break
+            time.sleep(0.1)
+        self.assertEqual(notified, {node.nodeid for node in self.tags})
+        self.uaclient.unsubscribe_datachange_nodes(nodes)
+        self.assertEqual(self.uaclient._subs_dc, {})
+
+    def test_subscriptions_by_publishing_interval(self):
+        class Handler:
+            def datachange_notification(self, node, val, data):
+                pass
+
+        nodes = [self.uaclient.get_node(node.nodeid) for node in self.tags]
+        handler = Handler()
+        self.uaclient.subscribe_datachange_nodes(nodes[:10], handler, 100, sampling_interval=50, queue_size=10)
+        self.uaclient.subscribe_datachange_nodes(nodes[10:], handler, 1000)
+        self.assertEqual(self.uaclient.get_datachange_subscriptions(), {100: 10, 1000: len(nodes) - 10})
+        self.uaclient.unsubscribe_datachange_nodes(nodes[:10])
+        self.assertEqual(self.uaclient.get_datachange_subscriptions(), {1000: len(nodes) - 10})
+        self.uaclient.unsubscribe_datachange_nodes(nodes[10:])
+        self.assertEqual(self.uaclient.get_datachange_subscriptions(), {})
+
+    def test_read_values(self):
+        self.uaclient._operation_limits["MaxNodesPerRead"] = 7
+        nodes = [self.uaclient.get_node(node.nodeid) for node in self.tags]
+        results = self.uaclient.read_values(nodes)
+        self.assertEqual([result.Value.Value for result in results], [float(i) for i in range(20)] + [float(i) for i in range(5)])
+
+    def test_poller(self):
+        buffers = ChannelBuffers(10)
+        channels = [(self.uaclient.get_node(node.nodeid), buffers.add_channel()) for node in self.tags[:3]]
+        poller = Poller(self.uaclient, 0.05)
+        poller.set_channels(channels)
+        for _ in range(50):
+            if all(len(channel.samples()[1]) >= 2 for _, channel in channels):
+                break
+            time.sleep(0.05)
+        poller.stop()
+        self.assertEqual([channel.samples()[1][-1] for _, channel in channels], [0.0, 1.0, 2.0])
+
+    def test_poller_drops_late_read(self):
+        reading = threading.Event()
+        release = threading.Event()
+        uaclient = self.uaclient
+
+        class SlowClient:
+            def read_values(self, nodes):
+                reading.set()
+                release.wait(5)
+                return uaclient.read_values(nodes)
+
+        buffers = ChannelBuffers(10)
+        channel = buffers.add_channel()
+        poller = Poller(SlowClient(), 0.01)
+        poller.set_channels([(self.uaclient.get_node(self.tags[1].nodeid), channel)])
+        self.assertTrue(reading.wait(5))
+        # the channel goes back to its subscription, the Read in progress must not append to it anymore
+        poller.stop()
+        release.set()
+        poller._thread.join(5)
+        self.assertEqual(len(channel.samples()[1]), 0)
+
+    def test_event_filter(self):
+        events = []
+
+        class Handler:
+            def event_notification(self, event):
+                events.append(event.get_event_props_as_fields_dict())
+
+        evfilter = EventFilterSettings(["Severity", "Message"], min_severity=500).to_event_filter()
+        server_node = self.uaclient.get_node(aua.ObjectIds.Server)
+        self.uaclient.subscribe_events(server_node, Handler(), evfilter)
+        generator = self.server.get_event_generator()
+        for severity in (100, 800):
+            generator.event.Severity = severity
+            generator.event.Message = aua.LocalizedText("severity {}".format(severity))
+            generator.trigger()
+        for _ in range(50):
+            if events:
+                break
+            time.sleep(0.1)
+        time.sleep(0.6)
+        # the server drops the low severity event and sends only the selected fields
+        self.assertEqual(len(events), 1)
+        self.assertEqual(set(events[0]), {"Severity", "Message"})
+        self.assertEqual(events[0]["Severity"].Value, 800)
+        self.uaclient.unsubscribe_events(server_node)
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
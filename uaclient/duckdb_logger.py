@@ -1,19 +1,311 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
 import duckdb
 
+from asyncua import ua
+
+from uaclient.journal import Journal
+
+
+logger = logging.getLogger(__name__)
+
+# columns and DuckDB types used by the batched inserts of the writer thread
+_COLUMNS = {
+    "nodes": (
+        ("node_key", "INTEGER"),
+        ("node_id", "VARCHAR"),
+        ("display_name", "VARCHAR"),
+        ("data_type", "VARCHAR"),
+        ("server", "VARCHAR"),
+    ),
+    "opcua_samples": (
+        ("node_key", "INTEGER"),
+        ("timestamp", "TIMESTAMP"),
+        ("server_timestamp", "TIMESTAMP"),
+        ("receive_timestamp", "TIMESTAMP"),
+        ("status_code", "UINTEGER"),
+        ("value_double", "DOUBLE"),
+        ("value_bigint", "BIGINT"),
+        ("value_bool", "BOOLEAN"),
+        ("value_varchar", "VARCHAR"),
+        ("seq", "BIGINT"),
+    ),
+    "opcua_event_logs": (
+        ("timestamp", "TIMESTAMP"),
+        ("event_type", "VARCHAR"),
+        ("source_node", "VARCHAR"),
+        ("source_name", "VARCHAR"),
+        ("severity", "INTEGER"),
+        ("time", "TIMESTAMP"),
+        ("message", "VARCHAR"),
+        ("fields", "JSON"),
+        ("server", "VARCHAR"),
+    ),
+}
+
+# event fields stored in their own columns, every other field goes to the fields JSON column
+EVENT_COLUMNS = ("EventType", "SourceNode", "SourceName", "Severity", "Time", "Message")
+
+_DOUBLE_TYPES = {ua.VariantType.Float, ua.VariantType.Double}
+_BIGINT_TYPES = {
+    ua.VariantType.SByte,
+    ua.VariantType.Byte,
+    ua.VariantType.Int16,
+    ua.VariantType.UInt16,
+    ua.VariantType.Int32,
+    ua.VariantType.UInt32,
+    ua.VariantType.Int64,
+    ua.VariantType.UInt64,
+}
+
+# value as read by the GUI, whatever typed column it was stored in
+VALUE_SQL = "COALESCE(CAST(value_double AS VARCHAR), CAST(value_bigint AS VARCHAR), CAST(value_bool AS VARCHAR), value_varchar)"
+
+# file system safe name of a server uri, used as hive partition value
+SERVER_PARTITION_SQL = "regexp_replace({}, '[^0-9A-Za-z._-]+', '_', 'g')"
+
+# resolution name and date_trunc part of the rollup tables kept by the writer
+ROLLUPS = (("1s", "second"), ("1m", "minute"), ("1h", "hour"))
+
+# numeric value of a sample used by the rollups, booleans count as 0/1
+_NUMERIC_SQL = "COALESCE(value_double, CAST(value_bigint AS DOUBLE), CAST(value_bool AS DOUBLE))"
+
+# time a sample is filed under: its source timestamp, or the best one the client got when the server sent none
+TIME_SQL = "COALESCE({0}timestamp, {0}server_timestamp, {0}receive_timestamp)"
+
+_ROLLUP_UPSERT = """
+    INSERT INTO opcua_rollup_{name} (node_key, bucket, count, min, max, sum, first, first_ts, last, last_ts)
+    SELECT node_key, date_trunc('{part}', timestamp), count(*), min(v), max(v), sum(v),
+           arg_min(v, timestamp), min(timestamp), arg_max(v, timestamp), max(timestamp)
+    FROM (SELECT node_key, {time} AS timestamp, {numeric} AS v FROM sample_batch)
+    WHERE v IS NOT NULL AND timestamp IS NOT NULL AND node_key IS NOT NULL
+    GROUP BY ALL
+    ON CONFLICT (node_key, bucket) DO UPDATE SET
+        count = count + EXCLUDED.count,
+        min = least(min, EXCLUDED.min),
+        max = greatest(max, EXCLUDED.max),
+        sum = sum + EXCLUDED.sum,
+        first = CASE WHEN EXCLUDED.first_ts < first_ts THEN EXCLUDED.first ELSE first END,
+        first_ts = least(first_ts, EXCLUDED.first_ts),
+        last = CASE WHEN EXCLUDED.last_ts >= last_ts THEN EXCLUDED.last ELSE last END,
+        last_ts = greatest(last_ts, EXCLUDED.last_ts)
+"""
+
+
+
+def _type_names_sql(types):
+    # data_type as written by older versions: str() of the VariantType, "VariantType.Double" or "11"
+    names = set()
+    for variant_type in types:
+        names.update((variant_type.name, "VariantType." + variant_type.name, str(variant_type.value)))
+    return ", ".join("'{}'".format(name) for name in sorted(names))
+
+
+# typed column values of a legacy VARCHAR value, {0} is the value and {1} the data_type
+_LEGACY_VALUES_SQL = """
+    CASE WHEN {{1}} IN ({doubles}) OR ({{1}} IN ({bigints}) AND TRY_CAST({{0}} AS BIGINT) IS NULL)
+         THEN TRY_CAST({{0}} AS DOUBLE) END,
+    CASE WHEN {{1}} IN ({bigints}) THEN TRY_CAST({{0}} AS BIGINT) END,
+    CASE WHEN {{1}} IN ({bools}) THEN TRY_CAST({{0}} AS BOOLEAN) END,
+    CASE WHEN NOT ({{1}} IN ({doubles}, {bigints}) AND TRY_CAST({{0}} AS DOUBLE) IS NOT NULL)
+          AND NOT ({{1}} IN ({bools}) AND TRY_CAST({{0}} AS BOOLEAN) IS NOT NULL)
+         THEN {{0}} END
+""".format(doubles=_type_names_sql(_DOUBLE_TYPES), bigints=_type_names_sql(_BIGINT_TYPES),
+           bools=_type_names_sql({ua.VariantType.Boolean}))
+
+# errors of the database itself rather than of the rows written, the rows are kept in the journal
+_TRANSIENT_ERRORS = (duckdb.IOException, duckdb.ConnectionException, duckdb.OutOfMemoryException,
+                     duckdb.InterruptException, duckdb.FatalException)
+
+_STOP = object()
+
+
+def split_value(value, variant_type):
+    """
+    return the (double, bigint, bool, varchar) column values for a notification value
+    the column is chosen from the VariantType, or from the python type if it is unknown
+    """
+    if value is None:
+        # a null array or a value the server did not send, whatever its VariantType
+        return None, None, None, None
+    if isinstance(value, (list, tuple)):
+        return None, None, None, str(value)
+    if variant_type is None:
+        if isinstance(value, bool):
+            variant_type = ua.VariantType.Boolean
+        elif isinstance(value, int):
+            variant_type = ua.VariantType.Int64
+        elif isinstance(value, float):
+            variant_type = ua.VariantType.Double
+    if variant_type == ua.VariantType.Boolean:
+        return None, None, bool(value), None
+    if variant_type in _BIGINT_TYPES:
+        if -2 ** 63 <= value < 2 ** 63:
+            return None, int(value), None, None
+        return float(value), None, None, None
+    if variant_type in _DOUBLE_TYPES:
+        return float(value), None, None, None
+    return None, None, None, str(value)
+
+
+def _to_utc(value):
+    # aware datetimes are stored as naive UTC, DuckDB would shift them to its local time zone
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _field_to_python(value):
+    if isinstance(value, ua.NodeId):
+        return value.to_string()
+    if isinstance(value, ua.LocalizedText):
+        return value.Text
+    if isinstance(value, ua.QualifiedName):
+        return value.to_string()
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    if isinstance(value, datetime):
+        return _to_utc(value).isoformat()
+    if isinstance(value, (list, tuple)):
+        return [_field_to_python(v) for v in value]
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def event_record(event):
+    """
+    decompose an asyncua event into a dict with the EVENT_COLUMNS
+    and a fields dict of the remaining event fields as plain python values
+    """
+    fields = {name: variant.Value for name, variant in event.get_event_props_as_fields_dict().items()}
+    record = {name: fields.pop(name, None) for name in EVENT_COLUMNS}
+    record["fields"] = {name: _field_to_python(value) for name, value in fields.items()}
+    return record
+
+
+def _event_row(row):
+    timestamp, record, server = row
+    event_type = record["EventType"]
+    source_node = record["SourceNode"]
+    message = record["Message"]
+    return (
+        _to_utc(timestamp),
+        event_type.to_string() if isinstance(event_type, ua.NodeId) else event_type,
+        source_node.to_string() if isinstance(source_node, ua.NodeId) else source_node,
+        record["SourceName"],
+        record["Severity"],
+        _to_utc(record["Time"]),
+        message.Text if isinstance(message, ua.LocalizedText) else message,
+        json.dumps(record["fields"]),
+        server,
+    )
+
+
+def _typed_sample_row(row):
+    node_key, value, variant_type, timestamp, server_timestamp, receive_timestamp, status_code = row
+    return (
+        node_key,
+        _to_utc(timestamp),
+        _to_utc(server_timestamp),
+        _to_utc(receive_timestamp),
+        status_code,
+    ) + split_value(value, variant_type)
+
+
+# conversions done by the writer thread before a row is inserted
+_ROW_CONVERTERS = {
+    "opcua_samples": _typed_sample_row,
+    "opcua_event_logs": _event_row,
+}
+
+
+class _Task:
+    """
+    function queued to run on the writer thread once the rows queued before it are written
+    """
+
+    def __init__(self, func):
+        self.func = func
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def run(self):
+        try:
+            self.result = self.func()
+        except Exception as ex:
+            self.error = ex
+        finally:
+            self.done.set()
+
 
 class DuckDBLogger:
-    def __init__(self):
-        # todo IOException handling if file is already in use.
+    """
+    Log data changes and events to a DuckDB file
+    rows are queued and written in batches by a dedicated writer thread,
+    so callers (usually Qt slots) never wait for the database
+    the writer owns the only connection to the file, readers in any thread use
+    cursors on the same database instance (see cursor and query)
+    if rotation_dir is given, finished hours are moved out of the live table
+    into server=/date=/hour= partitioned Parquet files below that directory
+    numeric samples are aggregated into 1s/1m/1h rollup tables as they are written,
+    rollup_retention maps a resolution to how long its buckets are kept (None: forever)
+    rows that cannot be written (file locked by another process, queue full because
+    the database is slow, failed inserts) are spilled to a journal next to the file
+    and replayed in bulk once the database is writable again
+    """
+
+    def __init__(self, batch_size=5000, flush_interval=0.5, queue_size=100000,
+                 rotation_dir=None, maintenance_interval=60, rotation_delay=300, rollup_retention=None,
+                 retry_interval=5, fsync_policy="interval", fsync_interval=1.0):
         self.is_connected = False
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rotation_dir = rotation_dir
+        self.maintenance_interval = maintenance_interval
+        self.rotation_delay = rotation_delay
+        self.rollup_retention = {"1s": timedelta(days=2), "1m": timedelta(days=90), "1h": None}
+        if rollup_retention:
+            self.rollup_retention.update(rollup_retention)
+        self.retry_interval = retry_interval
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self.dropped = 0
+        self.conn = None
+        self._path = None
+        self._journal = None
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = None
+        # keys handed out by register_node, they stay valid when the logger switches to another file:
+        # (server, node_id) -> key, and key -> (node_id, display_name, data_type, server)
+        self._node_keys = {}
+        self._node_info = {}
+        # the nodes table of the open file, (server, node_id) -> node_key, and its keys
+        self._file_nodes = {}
+        self._file_keys = set()
+        # keys whose node has another node_key in the file, or None if it is not in the file yet
+        self._key_map = {}
+        self._next_key = 1
+        self._node_lock = threading.Lock()
+        self._reader = None
+        self._reader_lock = threading.Lock()
+        self._local = threading.local()
+        self._generation = 0
 
     def create_table(self):
         self.conn.execute(
             """
-            CREATE TABLE IF NOT EXISTS opcua_logs (
-                timestamp TIMESTAMP,
-                display_name VARCHAR,
+            CREATE TABLE IF NOT EXISTS nodes (
+                node_key INTEGER PRIMARY KEY,
                 node_id VARCHAR,
-                value VARCHAR,
+                display_name VARCHAR,
                 data_type VARCHAR,
                 server VARCHAR
             )
@@ -21,65 +313,659 @@ class DuckDBLogger:
         )
         self.conn.execute(
             """
-            CREATE TABLE IF NOT EXISTS opcua_event_logs (
+            CREATE TABLE IF NOT EXISTS opcua_samples (
+                node_key INTEGER,
                 timestamp TIMESTAMP,
-                event VARCHAR,
-                server VARCHAR
+                server_timestamp TIMESTAMP,
+                receive_timestamp TIMESTAMP,
+                status_code UINTEGER,
+                value_double DOUBLE,
+                value_bigint BIGINT,
+                value_bool BOOLEAN,
+                value_varchar VARCHAR,
+                seq BIGINT
             )
         """
         )
-
-    def log_data(self, display_name, node_id, value, data_type, timestamp, server):
+        # seq numbers the samples in write order, readers use it as watermark to tail the log
+        self.conn.execute("ALTER TABLE opcua_samples ADD COLUMN IF NOT EXISTS seq BIGINT")
+        for name, typ in (("server_timestamp", "TIMESTAMP"), ("receive_timestamp", "TIMESTAMP"),
+                          ("status_code", "UINTEGER")):
+            self.conn.execute("ALTER TABLE opcua_samples ADD COLUMN IF NOT EXISTS {} {}".format(name, typ))
+        self._migrate_log_table()
+        self._migrate_event_table()
+        for name, _ in ROLLUPS:
+            self.conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS opcua_rollup_{} (
+                    node_key INTEGER,
+                    bucket TIMESTAMP,
+                    count BIGINT,
+                    min DOUBLE,
+                    max DOUBLE,
+                    sum DOUBLE,
+                    first DOUBLE,
+                    first_ts TIMESTAMP,
+                    last DOUBLE,
+                    last_ts TIMESTAMP,
+                    avg DOUBLE GENERATED ALWAYS AS (sum / count),
+                    PRIMARY KEY (node_key, bucket)
+                )
+            """.format(name)
+            )
+        # keeps the former opcua_logs layout for external tools like DBeaver,
+        # the individual timestamps and the status code are appended
         self.conn.execute(
             """
-            INSERT INTO opcua_logs (timestamp, display_name, node_id, value, data_type, server)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """,
-            (timestamp, display_name, node_id, str(value), data_type, server),
+            CREATE OR REPLACE VIEW opcua_logs AS
+            SELECT {} AS timestamp, n.display_name, n.node_id, s.value_double, s.value_bigint, s.value_bool,
+                   s.value_varchar, n.data_type, n.server, s.timestamp AS source_timestamp, s.server_timestamp,
+                   s.receive_timestamp, s.status_code
+            FROM opcua_samples s JOIN nodes n USING (node_key)
+        """.format(TIME_SQL.format("s."))
         )
-
-    def log_event(self, event, timestamp, server): #TODO: Eventstring in Json umformen und in DuckDB als Json speichern
         self.conn.execute(
             """
-            INSERT INTO opcua_event_logs (timestamp, event, server)
-            VALUES (?, ?, ?)
-        """,
-            (timestamp, event, server),
+            CREATE TABLE IF NOT EXISTS opcua_event_logs (
+                timestamp TIMESTAMP,
+                event_type VARCHAR,
+                source_node VARCHAR,
+                source_name VARCHAR,
+                severity INTEGER,
+                time TIMESTAMP,
+                message VARCHAR,
+                fields JSON,
+                server VARCHAR
+            )
+        """
         )
+        self._create_history_view()
+        self._seq = self.conn.execute("SELECT coalesce(max(seq), 0) FROM opcua_samples").fetchone()[0]
+        with self._node_lock:
+            first = not self._node_info
+            for key, node_id, display_name, data_type, server in self.conn.execute(
+                    "SELECT node_key, node_id, display_name, data_type, server FROM nodes").fetchall():
+                self._add_file_node((server, node_id), key)
+                if first:
+                    # the keys of the first file are handed out as they are
+                    self._node_keys[(server, node_id)] = key
+                    self._node_info[key] = (node_id, display_name, data_type, server)
+            self._key_map = {}
+            for node, key in self._node_keys.items():
+                file_key = self._file_nodes.get(node)
+                if file_key != key:
+                    self._key_map[key] = file_key
+            self._next_key = max(max(self._node_info, default=0), max(self._file_keys, default=0)) + 1
+
+    def _migrate_log_table(self):
+        # files written by older versions have opcua_logs as a table holding full strings in every row
+        row = self.conn.execute(
+            "SELECT table_type FROM information_schema.tables WHERE table_name = 'opcua_logs'"
+        ).fetchone()
+        if row is None or row[0] != "BASE TABLE":
+            return
+        logger.info("Migrating opcua_logs to the nodes and opcua_samples tables")
+        columns = [row[0] for row in self.conn.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = 'opcua_logs'"
+        ).fetchall()]
+        if "value" in columns:
+            # before the typed columns existed every value was stored as VARCHAR,
+            # it is cast to the typed column of its data_type and kept as VARCHAR only if it does not convert
+            values = _LEGACY_VALUES_SQL.format("l.value", "coalesce(l.data_type, '')")
+        else:
+            values = "l.value_double, l.value_bigint, l.value_bool, l.value_varchar"
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            self.conn.execute(
+                """
+                INSERT INTO nodes
+                SELECT row_number() OVER (ORDER BY server, node_id) + (SELECT coalesce(max(node_key), 0) FROM nodes),
+                       node_id, display_name, data_type, server
+                FROM (
+                    SELECT node_id, any_value(display_name) AS display_name, any_value(data_type) AS data_type, server
+                    FROM opcua_logs GROUP BY server, node_id
+                )
+            """
+            )
+            self.conn.execute(
+                """
+                INSERT INTO opcua_samples (node_key, timestamp, value_double, value_bigint, value_bool, value_varchar)
+                SELECT n.node_key, l.timestamp, {}
+                FROM opcua_logs l JOIN nodes n ON l.node_id = n.node_id AND l.server IS NOT DISTINCT FROM n.server
+            """.format(values)
+            )
+            self.conn.execute("DROP TABLE opcua_logs")
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def _migrate_event_table(self):
+        # older versions stored str(event) in a single VARCHAR column, those rows are kept as they are
+        columns = [row[0] for row in self.conn.execute(
+            "SELECT column_name FROM information_schema.columns WHERE table_name = 'opcua_event_logs'"
+        ).fetchall()]
+        if "event" in columns:
+            logger.info("Moving event text logs to opcua_event_logs_legacy")
+            self.conn.execute("ALTER TABLE opcua_event_logs RENAME TO opcua_event_logs_legacy")
+
+    def register_node(self, node_id, display_name, data_type, server):
+        """
+        return the small integer key logged samples of a node refer to
+        the node is added to the nodes table the first time it is seen, the key stays valid
+        when the logger is closed and connected to another file, the writer maps it to the
+        node_key of the node there
+        """
+        info = (node_id, display_name, data_type, server)
+        with self._node_lock:
+            key = self._node_keys.get((server, node_id))
+            if key is not None:
+                return key
+            if self.is_connected and (server, node_id) not in self._file_nodes:
+                # new to the file as well, it gets the same key there
+                key = self._add_node_key(info)
+                self._add_file_node((server, node_id), key)
+                self._put("nodes", (key,) + info)
+                return key
+            return self._add_mapped_key(info)
+
+    def _add_node_key(self, info):
+        # caller holds _node_lock
+        key = self._next_key
+        self._next_key += 1
+        self._node_keys[(info[3], info[0])] = key
+        self._node_info[key] = info
+        return key
+
+    def _add_mapped_key(self, info):
+        # caller holds _node_lock, the writer maps the key to the node_key of the node in the file
+        # or adds the node to the file once it is open
+        key = self._add_node_key(info)
+        self._key_map[key] = self._file_nodes.get((info[3], info[0]))
+        return key
+
+    def _add_file_node(self, node, key):
+        # caller holds _node_lock
+        self._file_nodes[node] = key
+        self._file_keys.add(key)
+
+    def _session_key(self, info):
+        # writer thread: key of a journaled node, which may not have been registered in this session
+        if info is None:
+            return None
+        with self._node_lock:
+            key = self._node_keys.get((info[3], info[0]))
+            if key is None:
+                key = self._add_mapped_key(info)
+            return key
+
+    def _file_key(self, key):
+        # writer thread: node_key of the node of a key in the open file, the node is added if it is new
+        if key not in self._key_map:
+            return key
+        file_key = self._key_map[key]
+        if file_key is not None:
+            return file_key
+        info = self._node_info[key]
+        with self._node_lock:
+            file_key = self._file_nodes.get((info[3], info[0]))
+            if file_key is None:
+                # same key as outside the file if it is free there
+                file_key = key if key not in self._file_keys else self._next_key
+                if file_key == self._next_key:
+                    self._next_key += 1
+                self._add_file_node((info[3], info[0]), file_key)
+        self.conn.execute("INSERT OR IGNORE INTO nodes VALUES (?, ?, ?, ?, ?)", (file_key,) + tuple(info))
+        with self._node_lock:
+            if file_key == key:
+                self._key_map.pop(key, None)
+            else:
+                self._key_map[key] = file_key
+        return file_key
+
+    def log_data(self, node_key, value, variant_type, timestamp, server_timestamp=None, receive_timestamp=None,
+                 status_code=None):
+        """
+        timestamps are datetimes (naive ones are taken as UTC) and are converted by the writer thread,
+        timestamp is the source timestamp of the value, status_code the integer StatusCode value
+        """
+        self._put("opcua_samples",
+                  (node_key, value, variant_type, timestamp, server_timestamp, receive_timestamp, status_code))
+
+    def log_event(self, event, timestamp, server):
+        """
+        event is a record as returned by event_record
+        """
+        self._put("opcua_event_logs", (timestamp, event, server))
+
+    def _put(self, table, row):
+        try:
+            self._queue.put_nowait((table, row))
+        except queue.Full:
+            if self._journal is None:
+                if not self.dropped:
+                    logger.warning("DuckDB write queue is full, dropping rows")
+                self.dropped += 1
+                return
+            # the writer is behind, keep the row in the journal instead of waiting for it
+            self._spill({table: self._convert(table, [row])})
+
+    def _convert(self, table, rows):
+        # column values of queued rows, rows that cannot be converted are dropped
+        convert = _ROW_CONVERTERS.get(table)
+        if convert is None:
+            return rows
+        try:
+            return [convert(row) for row in rows]
+        except Exception:
+            converted = []
+            for row in rows:
+                try:
+                    converted.append(convert(row))
+                except Exception:
+                    logger.exception("Could not convert a row of %s, dropping it", table)
+                    self.dropped += 1
+            return converted
+
+    def _journal_rows(self, pending):
+        # rows are journaled converted, as plain column values: values such as structures
+        # of generated classes cannot be pickled
+        rows = []
+        for table, table_rows in pending.items():
+            if table == "opcua_samples":
+                # samples carry their node instead of a key, keys may not exist in the file yet
+                table_rows = [(self._node_info.get(row[0]),) + row[1:] for row in table_rows]
+            rows.extend((table, row) for row in table_rows)
+        return rows
+
+    def _spill(self, pending):
+        rows = self._journal_rows(pending)
+        try:
+            self._journal.append(rows)
+        except Exception:
+            logger.exception("Could not write %s rows to journal %s", len(rows), self._journal.path)
+            self.dropped += len(rows)
+
+    def _dead_letter(self, dead):
+        rows = self._journal_rows(dead)
+        logger.error("Moving %s rows that cannot be written to %s", len(rows), self._journal.dead_letter_path)
+        try:
+            self._journal.dead_letter(rows)
+        except Exception:
+            logger.exception("Could not write %s rows to %s", len(rows), self._journal.dead_letter_path)
+            self.dropped += len(rows)
+
+    def _replay(self):
+        rows = self._journal.take()
+        if not rows:
+            self._journal.done()
+            return
+        logger.info("Replaying %s journaled rows into %s", len(rows), self._path)
+        pending = {}
+        dead = {}
+        for table, row in rows:
+            try:
+                if table == "opcua_samples":
+                    row = (self._session_key(row[0]),) + row[1:]
+            except _TRANSIENT_ERRORS:
+                raise
+            except Exception:
+                logger.exception("Could not replay a row of %s", table)
+                dead.setdefault(table, []).append(row)
+                continue
+            pending.setdefault(table, []).append(row)
+        if dead:
+            self._dead_letter(dead)
+        self._flush(pending, converted=True)
+        self._journal.done()
+
+    def flush(self, timeout=None):
+        """
+        block until every row queued so far has been written
+        """
+        self._call(lambda: None, timeout)
+
+    def _call(self, func, timeout=None):
+        # run func on the writer thread, which owns the connection
+        if self._writer is None:
+            return None
+        task = _Task(func)
+        self._queue.put(task)
+        task.done.wait(timeout)
+        if task.error is not None:
+            raise task.error
+        return task.result
 
     def close(self):
-        self.conn.close()
-        self.is_connected = False
+        if self._writer is None:
+            return
+        # the writer drains the queue up to the stop marker before it exits
+        self._queue.put(_STOP)
+        self._writer.join()
+        self._writer = None
+        if self.is_connected:
+            with self._reader_lock:
+                self.is_connected = False
+                self._generation += 1
+                self._reader.close()
+                self._reader = None
+            self.conn.close()
+            self.conn = None
+        self._journal.close()
+        self._journal = None
+        # rows logged from now on keep their keys, they are mapped to the nodes table of the next file
+        with self._node_lock:
+            self._file_nodes = {}
+            self._file_keys = set()
+            self._key_map = dict.fromkeys(self._node_info)
 
     def check_if_open(self):
         return self.is_connected
 
     def connect(self, path):
-        self.conn = duckdb.connect(path)
-        self.is_connected = True
-        self.create_table()
-
-    def data_change_handler(self, node, val, data):
-        # Existing code...
-        if hasattr(self, "duckdb_logger"):
-            self.duckdb_logger.log_data(
-                node.nodeid.to_string(), val, data.monitored_item.Value.VariantType
-            )
+        if self._writer is not None:
+            return  # already started, possibly still waiting for the file
+        self._path = path
+        self._journal = Journal(path + ".journal", self.fsync_policy, self.fsync_interval)
+        self._open()
+        self._writer = threading.Thread(target=self._run, name="DuckDBWriter", daemon=True)
+        self._writer.start()
 
-    def get_last_10_data(self, path):
+    def _open(self):
+        try:
+            self.conn = duckdb.connect(self._path)
+        except duckdb.Error as ex:
+            logger.warning("DuckDB file %s is not available (%s), rows are kept in %s until it is",
+                           self._path, ex, self._journal.path)
+            return False
         try:
-            notConnected = False
+            self.create_table()
+        except Exception:
+            # e.g. a migration that failed, the file is left as it was and opened again later
+            logger.exception("Could not prepare DuckDB file %s, rows are kept in %s until it is",
+                             self._path, self._journal.path)
+            self.conn.close()
+            self.conn = None
+            return False
+        with self._reader_lock:
+            # readers are derived from this cursor, never from the connection the writer is using
+            self._reader = self.conn.cursor()
+            self.is_connected = True
+        return True
+
+    def cursor(self):
+        """
+        return a new cursor for reading, it sees a consistent snapshot of the database
+        and can be used in any thread while the writer keeps writing
+        """
+        with self._reader_lock:
             if not self.is_connected:
-                self.connect(path)
-                notConnected = True
-            self.result = self.conn.sql(
-                """
-                SELECT timestamp, display_name, node_id, value, server FROM opcua_logs ORDER BY timestamp DESC LIMIT 100;
+                raise duckdb.ConnectionException("DuckDB logger is not connected")
+            return self._reader.cursor()
+
+    def query(self, sql, params=None):
+        """
+        run a read query on a cursor reused by the calling thread and return all rows
+        """
+        local = self._local
+        if getattr(local, "generation", None) != self._generation:
+            local.cursor = self.cursor()
+            local.generation = self._generation
+        return local.cursor.execute(sql, params).fetchall()
+
+    def _run(self):
+        pending = {}
+        count = 0
+        deadline = None
+        next_maintenance = time.monotonic() + self.maintenance_interval
+        next_retry = time.monotonic() + self.retry_interval
+        running = True
+        while running:
+            timeout = next_maintenance if deadline is None else min(deadline, next_maintenance)
+            if self.conn is None or self._journal.pending:
+                timeout = min(timeout, next_retry)
+            try:
+                item = self._queue.get(timeout=max(0.0, timeout - time.monotonic()))
+            except queue.Empty:
+                item = None
+            tasks = []
+            # drain whatever else is already queued without waking up again
+            while item is not None:
+                if item is _STOP:
+                    running = False
+                    break
+                if isinstance(item, _Task):
+                    tasks.append(item)
+                else:
+                    table, row = item
+                    pending.setdefault(table, []).append(row)
+                    count += 1
+                    if count >= self.batch_size:
+                        break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            if count and deadline is None:
+                deadline = time.monotonic() + self.flush_interval
+            if count and (not running or tasks or count >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(pending)
+                pending = {}
+                count = 0
+                deadline = None
+            for task in tasks:
+                task.run()
+            if self.conn is None and time.monotonic() >= next_retry:
+                try:
+                    self._open()
+                except Exception:
+                    logger.exception("Could not open DuckDB file %s", self._path)
+                next_retry = time.monotonic() + self.retry_interval
+            if self.conn is not None and self._journal.pending and self._queue.empty() \
+                    and time.monotonic() >= next_retry:
+                try:
+                    self._replay()
+                except Exception:
+                    logger.exception("Could not replay journal %s", self._journal.path)
+                next_retry = time.monotonic() + self.retry_interval
+            if self.conn is not None and time.monotonic() >= next_maintenance:
+                self._maintenance()
+                next_maintenance = time.monotonic() + self.maintenance_interval
+
+    def _maintenance(self):
+        if self.rotation_dir:
+            try:
+                self._rotate()
+            except Exception:
+                logger.exception("Could not rotate logged samples to %s", self.rotation_dir)
+        try:
+            self._expire_rollups()
+        except Exception:
+            logger.exception("Could not expire rollup buckets")
+
+    def _expire_rollups(self, now=None):
+        if now is None:
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+        for name, _ in ROLLUPS:
+            retention = self.rollup_retention.get(name)
+            if retention is not None:
+                self.conn.execute("DELETE FROM opcua_rollup_{} WHERE bucket < ?".format(name), [now - retention])
+
+    def _flush(self, pending, converted=False):
+        # pending rows are converted to column values first, unless they come from the journal
+        if not converted:
+            pending = {table: self._convert(table, rows) for table, rows in pending.items()}
+        if self.conn is None:
+            self._spill(pending)
+            return
+        failed = {}
+        dead = {}
+        for table, rows in pending.items():
+            # rows keep the keys of register_node, the journal maps those to their nodes
+            file_rows = rows
+            if table == "opcua_samples" and self._key_map:
+                try:
+                    file_rows = [(self._file_key(row[0]),) + row[1:] for row in rows]
+                except Exception:
+                    logger.exception("Could not add the nodes of %s samples, keeping them in the journal", len(rows))
+                    failed[table] = rows
+                    continue
+            try:
+                self._insert(table, file_rows)
+            except _TRANSIENT_ERRORS:
+                logger.exception("Could not write %s rows to %s, keeping them in the journal", len(rows), table)
+                failed[table] = rows
+            except Exception:
+                # most likely a few bad rows, they are singled out and the others written
+                logger.warning("Could not write %s rows to %s, writing them row by row", len(rows), table)
+                self._insert_rows(table, list(zip(rows, file_rows)), failed, dead)
+        if failed:
+            self._spill(failed)
+        if dead:
+            self._dead_letter(dead)
+
+    def _insert_rows(self, table, converted, failed, dead):
+        # converted are (row, row with the keys of the file) pairs, rows that fail on their own go to dead,
+        # rows left once the database itself fails go to failed
+        # halves of the rows are inserted down to single rows, so a few bad rows cost a few inserts, not one per row
+        if not converted:
+            return
+        if table in failed:
+            failed[table].extend(row for row, _ in converted)
+            return
+        try:
+            self._insert(table, [values for _, values in converted])
+        except _TRANSIENT_ERRORS:
+            logger.exception("Could not write %s rows to %s, keeping them in the journal", len(converted), table)
+            failed[table] = [row for row, _ in converted]
+        except Exception:
+            if len(converted) == 1:
+                logger.exception("Could not write a row to %s", table)
+                dead.setdefault(table, []).append(converted[0][0])
+                return
+            middle = len(converted) // 2
+            self._insert_rows(table, converted[:middle], failed, dead)
+            self._insert_rows(table, converted[middle:], failed, dead)
+
+    def _insert(self, table, values):
+        columns = _COLUMNS[table]
+        # one columnar insert per table, much faster than executemany
+        names = ", ".join(name for name, _ in columns)
+        unnests = ", ".join(
+            "UNNEST(${}::{}[]) AS {}".format(i, typ, name) for i, (name, typ) in enumerate(columns, start=1)
+        )
+        params = [list(col) for col in zip(*values)]
+        if table == "opcua_samples":
+            params.append(list(range(self._seq + 1, self._seq + 1 + len(values))))
+            self._insert_samples(unnests, params)
+            self._seq += len(values)
+        else:
+            insert = "INSERT OR IGNORE" if table == "nodes" else "INSERT"
+            self.conn.execute("{} INTO {} ({}) SELECT {}".format(insert, table, names, unnests), params)
+
+    def _insert_samples(self, unnests, params):
+        # samples and the rollups they update are written in one transaction
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            self.conn.execute("CREATE OR REPLACE TEMP TABLE sample_batch AS SELECT " + unnests, params)
+            self.conn.execute("INSERT INTO opcua_samples BY NAME SELECT * FROM sample_batch")
+            for name, part in ROLLUPS:
+                self.conn.execute(
+                    _ROLLUP_UPSERT.format(name=name, part=part, time=TIME_SQL.format(""), numeric=_NUMERIC_SQL))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def rotate(self, before=None):
+        """
+        move the samples older than before (default: the last finished hour) to Parquet files
+        """
+        return self._call(lambda: self._rotate(before))
+
+    def _rotate(self, before=None):
+        if self.conn is None:
+            return 0
+        if before is None:
+            now = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=self.rotation_delay)
+            before = now.replace(minute=0, second=0, microsecond=0)
+        time_sql = TIME_SQL.format("")
+        count = self.conn.execute(
+            "SELECT count(*) FROM opcua_samples WHERE {} < ?".format(time_sql), [before]).fetchone()[0]
+        if count:
+            self.conn.execute("BEGIN TRANSACTION")
+            try:
+                self.conn.execute(
+                    """
+                    COPY (
+                        SELECT timestamp, display_name, node_id, value_double, value_bigint, value_bool,
+                               value_varchar, data_type, server AS server_uri, source_timestamp, server_timestamp,
+                               receive_timestamp, status_code, {} AS server,
+                               strftime(timestamp, '%Y-%m-%d') AS date, hour(timestamp) AS hour
+                        FROM opcua_logs
+                        WHERE timestamp < ?
+                    ) TO '{}' (FORMAT PARQUET, PARTITION_BY (server, date, hour), FILENAME_PATTERN 'data_{{uuid}}', OVERWRITE_OR_IGNORE)
+                """.format(SERVER_PARTITION_SQL.format("server"), self._rotation_path()),
+                    [before],
+                )
+                self.conn.execute("DELETE FROM opcua_samples WHERE {} < ?".format(time_sql), [before])
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+            logger.info("Moved %s samples older than %s to %s", count, before, self.rotation_dir)
+            # globbing the Parquet tree and reading the footers gets slower as it grows, only done for new files
+            self._create_history_view()
+        return count
+
+    def _rotation_path(self):
+        return os.path.abspath(self.rotation_dir).replace("\\", "/").replace("'", "''")
+
+    def _create_history_view(self):
+        # live samples and rotated Parquet files in one view, filters on server_partition/date/hour prune files
+        live = """
+            SELECT timestamp, display_name, node_id, value_double, value_bigint, value_bool, value_varchar,
+                   data_type, server, source_timestamp, server_timestamp, receive_timestamp, status_code,
+                   {} AS server_partition, strftime(timestamp, '%Y-%m-%d') AS date, hour(timestamp) AS hour
+            FROM opcua_logs
+        """.format(SERVER_PARTITION_SQL.format("server"))
+        if self.rotation_dir and self._has_rotated_files():
+            files = """read_parquet('{}/**/*.parquet', hive_partitioning = true, union_by_name = true,
+                              hive_types = {{'date': VARCHAR, 'hour': BIGINT}})""".format(self._rotation_path())
+            # files rotated by older versions have no separate timestamps and status code
+            present = {row[0] for row in self.conn.execute("DESCRIBE SELECT * FROM " + files).fetchall()}
+            added = ", ".join(
+                name if name in present else "NULL AS " + name
+                for name in ("source_timestamp", "server_timestamp", "receive_timestamp", "status_code")
+            )
+            live += """
+            UNION ALL
+            SELECT timestamp, display_name, node_id, value_double, value_bigint, value_bool, value_varchar,
+                   data_type, server_uri AS server, {}, server AS server_partition, date,
+                   CAST(hour AS BIGINT) AS hour
+            FROM {}
+            """.format(added, files)
+        self.conn.execute("CREATE OR REPLACE VIEW opcua_logs_history AS " + live)
+
+    def _has_rotated_files(self):
+        for _, _, files in os.walk(self.rotation_dir):
+            if any(name.endswith(".parquet") for name in files):
+                return True
+        return False
+
+    def get_data_since(self, seq=None, limit=100):
+        """
+        return up to limit logged rows (seq, timestamp, display_name, node_id, value, server),
+        newest first, that were written after the row numbered seq (None: the latest rows)
+        seq grows with every row, so only row groups holding new rows are scanned
+        """
+        where = "" if seq is None else "WHERE s.seq > ?"
+        return self.query(
             """
-            ).fetchmany(100)
-            if notConnected:
-                self.close()
-            return self.result
-        except Exception as e:
-            print("Unable to connect to duckdb")
-            return None
+            SELECT s.seq, {}, n.display_name, n.node_id, {}, n.server
+            FROM opcua_samples s JOIN nodes n USING (node_key)
+            {}
+            ORDER BY s.seq DESC NULLS LAST LIMIT {:d}
+        """.format(TIME_SQL.format("s."), VALUE_SQL, where, limit),
+            None if seq is None else [seq],
+        )
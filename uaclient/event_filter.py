@@ -0,0 +1,64 @@
+from asyncua import ua
+
+# fields of BaseEventType that can be selected
+EVENT_FIELDS = ("EventId", "EventType", "SourceNode", "SourceName", "Time", "ReceiveTime", "LocalTime", "Message",
+                "Severity")
+
+
+class EventFilterSettings(object):
+    """
+    what the server sends for the events of subscribed nodes: the selected fields of the events
+    of event_type or its subtypes with at least min_severity, only from source_node if given
+    the server evaluates the filter, events it rejects never reach the client
+    """
+
+    def __init__(self, fields=EVENT_FIELDS, event_type=None, min_severity=0, source_node=None):
+        self.fields = list(fields)
+        self.event_type = event_type if event_type is not None else ua.NodeId(ua.ObjectIds.BaseEventType)
+        self.min_severity = min_severity
+        self.source_node = source_node
+
+    def to_event_filter(self):
+        evfilter = ua.EventFilter()
+        evfilter.SelectClauses = [_field_operand(name) for name in self.fields]
+        conditions = []
+        if self.event_type != ua.NodeId(ua.ObjectIds.BaseEventType):
+            conditions.append(_element(ua.FilterOperator.OfType, ua.LiteralOperand(Value=ua.Variant(self.event_type))))
+        if self.min_severity:
+            conditions.append(_element(ua.FilterOperator.GreaterThanOrEqual, _field_operand("Severity"),
+                                       ua.LiteralOperand(Value=ua.Variant(self.min_severity, ua.VariantType.UInt16))))
+        if self.source_node is not None:
+            conditions.append(_element(ua.FilterOperator.Equals, _field_operand("SourceNode"),
+                                       ua.LiteralOperand(Value=ua.Variant(self.source_node))))
+        if conditions:
+            _add_all(evfilter.WhereClause.Elements, conditions)
+        return evfilter
+
+
+def _field_operand(name):
+    op = ua.SimpleAttributeOperand()
+    op.TypeDefinitionId = ua.NodeId(ua.ObjectIds.BaseEventType)
+    op.BrowsePath = [ua.QualifiedName(name, 0)]
+    op.AttributeId = ua.AttributeIds.Value
+    return op
+
+
+def _element(operator, *operands):
+    el = ua.ContentFilterElement()
+    el.FilterOperator = operator
+    el.FilterOperands = list(operands)
+    return el
+
+
+def _add_all(elements, conditions):
+    # the server evaluates the first element, several conditions are joined by nested And elements
+    index = len(elements)
+    if len(conditions) == 1:
+        elements.append(conditions[0])
+        return index
+    el = _element(ua.FilterOperator.And)
+    elements.append(el)
+    first = _add_all(elements, conditions[:1])
+    rest = _add_all(elements, conditions[1:])
+    el.FilterOperands = [ua.ElementOperand(Index=first), ua.ElementOperand(Index=rest)]
+    return index
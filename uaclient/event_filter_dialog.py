@@ -0,0 +1,61 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QDialog, QListWidgetItem, QMessageBox
+
+from asyncua import ua
+
+from uaclient.event_filter import EVENT_FIELDS, EventFilterSettings
+from uaclient.event_filter_ui import Ui_EventFilterDialog
+
+
+class EventFilterDialog(QDialog):
+    """
+    edit the EventFilterSettings used when subscribing to events
+    """
+
+    def __init__(self, parent):
+        QDialog.__init__(self, parent)
+        self.ui = Ui_EventFilterDialog()
+        self.ui.setupUi(self)
+        for name in EVENT_FIELDS:
+            item = QListWidgetItem(name, self.ui.fieldsListWidget)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Checked)
+
+    @property
+    def event_filter(self):
+        fields = []
+        for row in range(self.ui.fieldsListWidget.count()):
+            item = self.ui.fieldsListWidget.item(row)
+            if item.checkState() == Qt.Checked:
+                fields.append(item.text())
+        return EventFilterSettings(
+            fields,
+            _parse_nodeid(self.ui.eventTypeLineEdit.text()),
+            self.ui.minSeveritySpinBox.value(),
+            _parse_nodeid(self.ui.sourceNodeLineEdit.text()),
+        )
+
+    @event_filter.setter
+    def event_filter(self, settings):
+        for row in range(self.ui.fieldsListWidget.count()):
+            item = self.ui.fieldsListWidget.item(row)
+            item.setCheckState(Qt.Checked if item.text() in settings.fields else Qt.Unchecked)
+        self.ui.eventTypeLineEdit.setText(settings.event_type.to_string())
+        self.ui.minSeveritySpinBox.setValue(settings.min_severity)
+        self.ui.sourceNodeLineEdit.setText(settings.source_node.to_string() if settings.source_node is not None else "")
+
+    def accept(self):
+        try:
+            settings = self.event_filter
+        except Exception as ex:
+            QMessageBox.warning(self, "Event Filter", "Invalid NodeId: {}".format(ex))
+            return
+        if not settings.fields:
+            QMessageBox.warning(self, "Event Filter", "Select at least one field")
+            return
+        QDialog.accept(self)
+
+
+def _parse_nodeid(text):
+    text = text.strip()
+    return ua.NodeId.from_string(text) if text else None
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file '.\uaclient\event_filter_ui.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.11
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_EventFilterDialog(object):
+    def setupUi(self, EventFilterDialog):
+        EventFilterDialog.setObjectName("EventFilterDialog")
+        EventFilterDialog.resize(380, 360)
+        self.formLayout = QtWidgets.QFormLayout(EventFilterDialog)
+        self.formLayout.setObjectName("formLayout")
+        self.fieldsLabel = QtWidgets.QLabel(EventFilterDialog)
+        self.fieldsLabel.setObjectName("fieldsLabel")
+        self.formLayout.setWidget(0, QtWidgets.QFormLayout.LabelRole, self.fieldsLabel)
+        self.fieldsListWidget = QtWidgets.QListWidget(EventFilterDialog)
+        self.fieldsListWidget.setObjectName("fieldsListWidget")
+        self.formLayout.setWidget(0, QtWidgets.QFormLayout.FieldRole, self.fieldsListWidget)
+        self.eventTypeLabel = QtWidgets.QLabel(EventFilterDialog)
+        self.eventTypeLabel.setObjectName("eventTypeLabel")
+        self.formLayout.setWidget(1, QtWidgets.QFormLayout.LabelRole, self.eventTypeLabel)
+        self.eventTypeLineEdit = QtWidgets.QLineEdit(EventFilterDialog)
+        self.eventTypeLineEdit.setObjectName("eventTypeLineEdit")
+        self.formLayout.setWidget(1, QtWidgets.QFormLayout.FieldRole, self.eventTypeLineEdit)
+        self.minSeverityLabel = QtWidgets.QLabel(EventFilterDialog)
+        self.minSeverityLabel.setObjectName("minSeverityLabel")
+        self.formLayout.setWidget(2, QtWidgets.QFormLayout.LabelRole, self.minSeverityLabel)
+        self.minSeveritySpinBox = QtWidgets.QSpinBox(EventFilterDialog)
+        self.minSeveritySpinBox.setMaximum(1000)
+        self.minSeveritySpinBox.setObjectName("minSeveritySpinBox")
+        self.formLayout.setWidget(2, QtWidgets.QFormLayout.FieldRole, self.minSeveritySpinBox)
+        self.sourceNodeLabel = QtWidgets.QLabel(EventFilterDialog)
+        self.sourceNodeLabel.setObjectName("sourceNodeLabel")
+        self.formLayout.setWidget(3, QtWidgets.QFormLayout.LabelRole, self.sourceNodeLabel)
+        self.sourceNodeLineEdit = QtWidgets.QLineEdit(EventFilterDialog)
+        self.sourceNodeLineEdit.setObjectName("sourceNodeLineEdit")
+        self.formLayout.setWidget(3, QtWidgets.QFormLayout.FieldRole, self.sourceNodeLineEdit)
+        self.buttonBox = QtWidgets.QDialogButtonBox(EventFilterDialog)
+        self.buttonBox.setOrientation(QtCore.Qt.Horizontal)
+        self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Cancel|QtWidgets.QDialogButtonBox.Ok)
+        self.buttonBox.setObjectName("buttonBox")
+        self.formLayout.setWidget(4, QtWidgets.QFormLayout.SpanningRole, self.buttonBox)
+
+        self.retranslateUi(EventFilterDialog)
+        self.buttonBox.accepted.connect(EventFilterDialog.accept) # type: ignore
+        self.buttonBox.rejected.connect(EventFilterDialog.reject) # type: ignore
+        QtCore.QMetaObject.connectSlotsByName(EventFilterDialog)
+
+    def retranslateUi(self, EventFilterDialog):
+        _translate = QtCore.QCoreApplication.translate
+        EventFilterDialog.setWindowTitle(_translate("EventFilterDialog", "Event Filter"))
+        self.fieldsLabel.setText(_translate("EventFilterDialog", "Fields"))
+        self.fieldsListWidget.setToolTip(_translate("EventFilterDialog", "Event fields the server sends"))
+        self.eventTypeLabel.setText(_translate("EventFilterDialog", "Event type"))
+        self.eventTypeLineEdit.setToolTip(_translate("EventFilterDialog", "NodeId of the event type, events of its subtypes are sent too"))
+        self.eventTypeLineEdit.setPlaceholderText(_translate("EventFilterDialog", "i=2041"))
+        self.minSeverityLabel.setText(_translate("EventFilterDialog", "Minimum severity"))
+        self.minSeveritySpinBox.setSpecialValueText(_translate("EventFilterDialog", "Any"))
+        self.sourceNodeLabel.setText(_translate("EventFilterDialog", "Source node"))
+        self.sourceNodeLineEdit.setToolTip(_translate("EventFilterDialog", "NodeId of the only source node whose events are sent"))
+        self.sourceNodeLineEdit.setPlaceholderText(_translate("EventFilterDialog", "Any"))
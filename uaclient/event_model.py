@@ -0,0 +1,99 @@
+from asyncua import ua
+
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+
+def event_texts(record):
+    """
+    format an event record (see duckdb_logger.event_record) as the texts of an EventModel row,
+    fields the event filter did not select are empty
+    """
+    event_type = record["EventType"]
+    message = record["Message"]
+    return (
+        _text(record["Time"]),
+        _text(record["Severity"]),
+        _text(record["SourceName"]),
+        event_type.to_string() if event_type is not None else "",
+        message.Text if isinstance(message, ua.LocalizedText) else _text(message),
+    )
+
+
+def _text(value):
+    return str(value) if value is not None else ""
+
+
+class EventModel(QAbstractTableModel):
+    """
+    Table model of the event view, a ring buffer of the last capacity events
+    rows are kept formatted, once the buffer is full every new row replaces the oldest one,
+    older events are still in the DuckDB opcua_event_logs table
+    """
+
+    HEADERS = ("Time", "Severity", "Source", "EventType", "Message")
+
+    def __init__(self, capacity=10000, parent=None):
+        QAbstractTableModel.__init__(self, parent)
+        self.capacity = capacity
+        self._rows = [None] * capacity
+        # position of the oldest row in _rows
+        self._start = 0
+        self._count = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        return self._rows[(self._start + index.row()) % self.capacity][index.column()]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return QAbstractTableModel.headerData(self, section, orientation, role)
+
+    def flags(self, index):
+        # nodes are dropped on the view to subscribe to their events
+        return QAbstractTableModel.flags(self, index) | Qt.ItemIsDropEnabled
+
+    def mimeTypes(self):
+        return ["text/plain"]
+
+    def add_rows(self, rows):
+        """
+        append a batch of rows, dropping the oldest rows beyond capacity
+        """
+        if not rows:
+            return
+        if len(rows) >= self.capacity:
+            self.beginResetModel()
+            self._rows = list(rows[-self.capacity:])
+            self._start = 0
+            self._count = self.capacity
+            self.endResetModel()
+            return
+        overflow = self._count + len(rows) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QModelIndex(), 0, overflow - 1)
+            self._start = (self._start + overflow) % self.capacity
+            self._count -= overflow
+            self.endRemoveRows()
+        first = self._count
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        position = (self._start + first) % self.capacity
+        for row in rows:
+            self._rows[position] = row
+            position = (position + 1) % self.capacity
+        self._count += len(rows)
+        self.endInsertRows()
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = [None] * self.capacity
+        self._start = 0
+        self._count = 0
+        self.endResetModel()
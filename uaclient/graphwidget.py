@@ -1,6 +1,9 @@
 #! /usr/bin/env python3
 
 import logging
+import threading
+from datetime import datetime, timezone
+
 from PyQt5.QtCore import QTimer, Qt
 from PyQt5.QtWidgets import QLabel
 
@@ -25,7 +28,198 @@ if use_graph:
 logger = logging.getLogger(__name__)
 
 
+class ChannelBuffers(object):
+    """
+    Last samples of all plotted channels, in preallocated arrays of timestamps and values
+    with a row per channel, each channel has its own write position as channels get samples
+    at their own rate
+    every sample is written twice, at its position in the ring and size columns further,
+    so the samples of a channel in order are always one contiguous slice: samples returns views
+    appending is O(1) and allocates nothing, only adding channels beyond the rows or resizing does
+    """
+
+    def __init__(self, size, rows=16):
+        self._lock = threading.Lock()
+        self.size = size
+        # seconds since the epoch
+        self._times = np.zeros((rows, 2 * size))
+        self._values = np.zeros((rows, 2 * size))
+        # per row: next write position and number of samples
+        self._positions = [0] * rows
+        self._counts = [0] * rows
+        self._free = list(range(rows - 1, -1, -1))
+
+    def add_channel(self):
+        with self._lock:
+            if not self._free:
+                rows = len(self._values)
+                self._times = _grown(self._times, 2 * rows)
+                self._values = _grown(self._values, 2 * rows)
+                self._positions += [0] * rows
+                self._counts += [0] * rows
+                self._free = list(range(2 * rows - 1, rows - 1, -1))
+            row = self._free.pop()
+            self._positions[row] = 0
+            self._counts[row] = 0
+            return Channel(self, row)
+
+    def remove_channel(self, channel):
+        with self._lock:
+            self._free.append(channel.row)
+            channel.row = None
+
+    def append(self, channel, timestamp, value):
+        with self._lock:
+            # the channel may have been removed while the sample was on its way
+            row = channel.row
+            if row is None:
+                return
+            position = self._positions[row]
+            self._times[row, position] = self._times[row, position + self.size] = timestamp
+            self._values[row, position] = self._values[row, position + self.size] = value
+            self._positions[row] = (position + 1) % self.size
+            if self._counts[row] < self.size:
+                self._counts[row] += 1
+
+    def samples(self, channel):
+        """
+        return views of the timestamps and values of a channel, oldest first
+        they change as samples are appended, see snapshot for stable arrays
+        """
+        with self._lock:
+            row = channel.row
+            end = self._positions[row] + self.size
+            start = end - self._counts[row]
+            return self._times[row, start:end], self._values[row, start:end]
+
+    def snapshot(self, channel):
+        """
+        return copies of the timestamps and values of a channel, oldest first, for drawing
+        the copies go to a buffer of the channel that is reused by its next snapshot,
+        appending does not change them
+        """
+        with self._lock:
+            row = channel.row
+            if channel._draw is None or channel._draw.shape[1] != self.size:
+                channel._draw = np.zeros((2, self.size))
+            count = self._counts[row]
+            end = self._positions[row] + self.size
+            times = channel._draw[0, :count]
+            values = channel._draw[1, :count]
+            np.copyto(times, self._times[row, end - count:end])
+            np.copyto(values, self._values[row, end - count:end])
+            return times, values
+
+    def resize(self, size):
+        """
+        keep the last size samples of every channel
+        """
+        with self._lock:
+            if size == self.size:
+                return
+            times = np.zeros((len(self._values), 2 * size))
+            values = np.zeros((len(self._values), 2 * size))
+            for row, count in enumerate(self._counts):
+                end = self._positions[row] + self.size
+                count = min(count, size)
+                times[row, :count] = times[row, size:size + count] = self._times[row, end - count:end]
+                values[row, :count] = values[row, size:size + count] = self._values[row, end - count:end]
+                self._positions[row] = count % size
+                self._counts[row] = count
+            self._times = times
+            self._values = values
+            self.size = size
+
+
+def _grown(array, rows):
+    grown = np.zeros((rows, array.shape[1]))
+    grown[:len(array)] = array
+    return grown
+
+
+class Channel(object):
+    """
+    samples of one plotted node, a row of ChannelBuffers
+    appended from the OPC UA client thread and drawn by the GUI
+    """
+
+    def __init__(self, buffers, row):
+        self._buffers = buffers
+        self.row = row
+        # timestamps and values of the last snapshot, what the curve of the channel draws
+        self._draw = None
+
+    def append(self, timestamp, value):
+        """
+        timestamp is the datetime of the sample, naive ones are taken as UTC
+        """
+        if value is None:
+            return  # bad quality sample without value
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        self._buffers.append(self, timestamp.timestamp(), float(value))
+
+    def samples(self):
+        return self._buffers.samples(self)
+
+    def snapshot(self):
+        return self._buffers.snapshot(self)
+
+
+class Poller(object):
+    """
+    read the values of the polled channels in a worker thread, with one batched Read per interval,
+    for servers whose subscriptions do not work well
+    """
+
+    def __init__(self, uaclient, interval):
+        self._uaclient = uaclient
+        self.interval = interval
+        self._lock = threading.Lock()
+        # (node, channel) pairs
+        self._channels = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="GraphPoller", daemon=True)
+        self._thread.start()
+
+    def set_channels(self, channels):
+        with self._lock:
+            self._channels = list(channels)
+
+    def stop(self):
+        # a Read in progress is not waited for, its results are dropped: the channels are attached
+        # to the subscriptions again, where a late sample would land after newer ones
+        with self._lock:
+            self._stop.set()
+            self._channels = []
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                channels = self._channels
+            if channels:
+                try:
+                    results = self._uaclient.read_values([node for node, _ in channels])
+                except Exception as ex:
+                    logger.warning("Could not read the polled graph nodes: %s", ex)
+                else:
+                    now = datetime.now(timezone.utc)
+                    with self._lock:
+                        if self._stop.is_set():
+                            return
+                        for (_, channel), result in zip(channels, results):
+                            if result.StatusCode.is_good():
+                                channel.append(result.SourceTimestamp or result.ServerTimestamp or now,
+                                               result.Value.Value)
+            self._stop.wait(self.interval)
+
+
 class GraphUI(object):
+    """
+    plot the samples of subscribed nodes against their timestamps, they are received with the
+    other data changes and kept per channel, the timer only redraws
+    in polling mode a Poller reads all plotted nodes instead, the nodes are not subscribed
+    """
 
     # use tango color schema (public domain)
     colorCycle = ['#4e9a06ff', '#ce5c00ff', '#3465a4ff', '#75507bff', '#cc0000ff', '#edd400ff']
@@ -39,11 +233,17 @@ class GraphUI(object):
         if not use_graph:
             self.window.ui.graphLayout.addWidget(QLabel("pyqtgraph or numpy not installed"))
             return
-        self._node_list = []  # holds the nodes to poll
-        self._channels = []  # holds the actual data
+        self._node_list = []  # holds the plotted nodes
+        self._names = []  # holds their display names
+        self._channels = []  # holds the channels of the plotted nodes
         self._curves = []  # holds the curve objects
-        self.pw = pg.PlotWidget(name='Plot1')
+        self._buffers = ChannelBuffers(self.window.ui.spinBoxNumberOfPoints.value())
+        self._poller = None
+        self.pw = pg.PlotWidget(name='Plot1', axisItems={'bottom': pg.DateAxisItem()})
         self.pw.showGrid(x=True, y=True, alpha=0.3)
+        # long channels are only drawn where visible, with about one point per pixel
+        self.pw.setClipToView(True)
+        self.pw.setDownsampling(auto=True, mode='peak')
         self.legend = self.pw.addLegend()
         self.window.ui.graphLayout.addWidget(self.pw)
 
@@ -63,21 +263,20 @@ class GraphUI(object):
         if hasattr(self, 'timer') and self.timer.isActive():
             self.timer.stop()
 
-        # define the number of polls displayed in graph
+        # define the number of samples displayed in graph
         self.N = self.window.ui.spinBoxNumberOfPoints.value()
-        self.ts = np.arange(self.N)
-        # define the poll intervall
+        # define the redraw intervall
         self.intervall = self.window.ui.spinBoxIntervall.value() * 1000
 
-        # overwrite current channel buffers with zeros of current length and add to curves again
-        for i, channel in enumerate(self._channels):
-            self._channels[i] = np.zeros(self.N)
-            self._curves[i].setData(self._channels[i])
+        # keep the last N samples of every channel
+        self._buffers.resize(self.N)
+        self._set_polling(self.window.ui.checkBoxPolling.isChecked())
+        self.redraw()
 
         # starting new timer
         self.timer = QTimer()
         self.timer.setInterval(self.intervall)
-        self.timer.timeout.connect(self.pushtoGraph)
+        self.timer.timeout.connect(self.redraw)
         self.timer.start()
 
     @trycatchslot
@@ -92,15 +291,19 @@ class GraphUI(object):
             dtypeStr = ua.ObjectIdNames[dtype.Value.Value.Identifier]
 
             if dtypeStr in self.acceptedDatatypes and not isinstance(node.get_value(), list):
+                channel = self._buffers.add_channel()
+                # samples come from the poller or the data change subscription of the node
+                if self._poller is None and self.window.datachange_ui.attach_channels([(node, channel)]):
+                    self._buffers.remove_channel(channel)
+                    return
                 self._node_list.append(node)
                 displayName = node.read_display_name().Text
+                self._names.append(displayName)
                 colorIndex = len(self._node_list) % len(self.colorCycle)
                 self._curves.append \
                     (self.pw.plot(pen=pg.mkPen(color=self.colorCycle[colorIndex], width=3, style=Qt.SolidLine), name=displayName))
-                # set initial data to zero
-                self._channels.append(np.zeros(self.N))  # init data sequence with zeros
-                # add the new channel data to the new curve
-                self._curves[-1].setData(self._channels[-1])
+                self._channels.append(channel)
+                self._update_poller()
                 logger.info("Variable %s added to graph", displayName)
 
             else:
@@ -112,24 +315,50 @@ class GraphUI(object):
             node = self.window.get_current_node()
             if node is None:
                 return
+        self.remove_node(node)
+
+    def remove_node(self, node):
         if node in self._node_list:
             idx = self._node_list.index(node)
+            if self._poller is None:
+                self.window.datachange_ui.detach_channel(node)
             self._node_list.pop(idx)
-            displayName = node.read_display_name().Text
-            self.legend.removeItem(displayName)
+            self.legend.removeItem(self._names.pop(idx))
             self.pw.removeItem(self._curves[idx])
             self._curves.pop(idx)
-            self._channels.pop(idx)
+            self._buffers.remove_channel(self._channels.pop(idx))
+            self._update_poller()
+
+    def _set_polling(self, polling):
+        if polling:
+            if self._poller is None:
+                # subscribed nodes stay subscribed, their samples just do not go to the graph anymore
+                for node in self._node_list:
+                    self.window.datachange_ui.detach_channel(node)
+                self._poller = Poller(self.uaclient, self.intervall / 1000)
+            self._poller.interval = self.intervall / 1000
+            self._update_poller()
+        elif self._poller is not None:
+            self._poller.stop()
+            self._poller = None
+            for node in self.window.datachange_ui.attach_channels(list(zip(self._node_list, self._channels))):
+                self.remove_node(node)
 
-    def pushtoGraph(self):
-        # ringbuffer: shift and replace last
-        for i, node in enumerate(self._node_list):
-            self._channels[i] = np.roll(self._channels[i], -1)  # shift elements to the left by one
-            self._channels[i][-1] = float(node.get_value())
-            self._curves[i].setData(self.ts, self._channels[i])
+    def _update_poller(self):
+        if self._poller is not None:
+            self._poller.set_channels(zip(self._node_list, self._channels))
+
+    def redraw(self):
+        for channel, curve in zip(self._channels, self._curves):
+            # pyqtgraph keeps the arrays until it paints, the live views would change under it
+            times, values = channel.snapshot()
+            curve.setData(times, values)
 
     def clear(self):
-        pass
+        if not use_graph:
+            return
+        for node in list(self._node_list):
+            self.remove_node(node)
 
     def show_error(self, *args):
         self.window.show_error(*args)
@@ -0,0 +1,45 @@
+import threading
+
+
+class StageTimes:
+    """
+    Time spent per stage of the notification pipeline
+    callers measure with time.perf_counter and add the seconds,
+    several threads may add at the same time
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def add(self, stage, seconds, count=1):
+        with self._lock:
+            total, calls = self._totals.get(stage, (0.0, 0))
+            self._totals[stage] = (total + seconds, calls + count)
+
+    def add_many(self, times, count):
+        """
+        add the seconds of several stages (dict stage -> seconds) measured over count items
+        """
+        with self._lock:
+            for stage, seconds in times.items():
+                total, calls = self._totals.get(stage, (0.0, 0))
+                self._totals[stage] = (total + seconds, calls + count)
+
+    def snapshot(self):
+        """
+        return a dict stage -> (total seconds, count)
+        """
+        with self._lock:
+            return dict(self._totals)
+
+    def reset(self):
+        with self._lock:
+            self._totals = {}
+
+    def summary(self):
+        parts = []
+        for stage, (total, count) in self.snapshot().items():
+            if count:
+                parts.append("{}: {:.1f} us x {} ({:.3f} s)".format(stage, total / count * 1e6, count, total))
+        return ", ".join(parts)
@@ -0,0 +1,187 @@
+import logging
+import os
+import pickle
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+logger = logging.getLogger(__name__)
+
+_LENGTH = struct.Struct("<I")
+
+FSYNC_POLICIES = ("always", "interval", "never")
+
+
+class Journal:
+    """
+    Append-only file of length prefixed records, used by the DuckDB logger
+    to keep rows it cannot write to the database right now
+    every record is a pickled list of (table, row) tuples, a truncated last
+    record (crash while appending) is ignored when the journal is read
+    records that cannot be read and rows that cannot be written are moved to
+    a dead letter file (path + ".dead", same format) so they do not block the rest
+    fsync_policy: "always" fsyncs every append, "interval" at most every
+    fsync_interval seconds, "never" leaves it to the operating system
+    every process logging to the same database shares the journal, appending and
+    setting the file aside hold an exclusive lock on it
+    """
+
+    def __init__(self, path, fsync_policy="interval", fsync_interval=1.0):
+        if fsync_policy not in FSYNC_POLICIES:
+            raise ValueError("fsync_policy must be one of {}".format(", ".join(FSYNC_POLICIES)))
+        self.path = path
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval
+        self._file = None
+        self._last_sync = 0.0
+        self._lock = threading.Lock()
+        # records left by an earlier session are replayed as well
+        self._pending = self._has_records(self._replay_path)
+
+    @property
+    def pending(self):
+        # another process using the same database may have appended as well
+        return self._pending or self._has_records(self.path)
+
+    @property
+    def _replay_path(self):
+        return self.path + ".replay"
+
+    @property
+    def dead_letter_path(self):
+        return self.path + ".dead"
+
+    @staticmethod
+    def _has_records(path):
+        return os.path.exists(path) and os.path.getsize(path) > 0
+
+    def append(self, rows):
+        if not rows:
+            return
+        payload = pickle.dumps(rows, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            f = self._locked_file()
+            try:
+                f.write(_LENGTH.pack(len(payload)))
+                f.write(payload)
+                f.flush()
+                now = time.monotonic()
+                if self.fsync_policy == "always" or (
+                        self.fsync_policy == "interval" and now - self._last_sync >= self.fsync_interval):
+                    os.fsync(f.fileno())
+                    self._last_sync = now
+            finally:
+                _unlock_file(f)
+            self._pending = True
+
+    def _locked_file(self):
+        # caller holds _lock: the journal file locked against other processes, reopened
+        # if another process set the file it had open aside in the meantime
+        while True:
+            if self._file is None:
+                self._file = open(self.path, "ab")
+            _lock_file(self._file)
+            try:
+                current = os.stat(self.path).st_ino == os.fstat(self._file.fileno()).st_ino
+            except FileNotFoundError:
+                current = False
+            if current:
+                return self._file
+            _unlock_file(self._file)
+            self._file.close()
+            self._file = None
+
+    def take(self):
+        """
+        return all journaled rows, the file is set aside until done is called,
+        so rows appended in the meantime go to a new file
+        """
+        with self._lock:
+            if not self._has_records(self._replay_path) and os.path.exists(self.path):
+                f = self._locked_file()
+                try:
+                    os.replace(self.path, self._replay_path)
+                finally:
+                    _unlock_file(f)
+                    f.close()
+                    self._file = None
+            self._pending = False
+        if not os.path.exists(self._replay_path):
+            return []
+        rows = []
+        for payload in self._read(self._replay_path):
+            try:
+                rows.extend(pickle.loads(payload))
+            except Exception:
+                logger.exception("Moving an unreadable record of %s to %s", self._replay_path, self.dead_letter_path)
+                self._write_dead_letter(payload)
+        return rows
+
+    def dead_letter(self, rows):
+        """
+        keep rows that failed on their own in the dead letter file instead of replaying them again
+        """
+        if rows:
+            self._write_dead_letter(pickle.dumps(rows, pickle.HIGHEST_PROTOCOL))
+
+    def _write_dead_letter(self, payload):
+        with self._lock:
+            with open(self.dead_letter_path, "ab") as f:
+                f.write(_LENGTH.pack(len(payload)))
+                f.write(payload)
+                f.flush()
+                if self.fsync_policy != "never":
+                    os.fsync(f.fileno())
+
+    def done(self):
+        """
+        forget the rows returned by take, they have been written
+        """
+        if os.path.exists(self._replay_path):
+            os.remove(self._replay_path)
+
+    @staticmethod
+    def _read(path):
+        with open(path, "rb") as f:
+            while True:
+                header = f.read(_LENGTH.size)
+                if len(header) < _LENGTH.size:
+                    return
+                size, = _LENGTH.unpack(header)
+                payload = f.read(size)
+                if len(payload) < size:
+                    logger.warning("Ignoring truncated record at the end of %s", path)
+                    return
+                yield payload
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                if self.fsync_policy != "never":
+                    os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+
+
+def _lock_file(f):
+    # blocks while another process holds the lock
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+
+
+def _unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
@@ -3,8 +3,11 @@
 import sys
 from pathlib import Path
 
-from datetime import datetime
+from datetime import datetime, timezone
 import logging
+import threading
+import time
+from collections import deque
 
 from PyQt5.QtCore import (
     pyqtSignal,
@@ -27,6 +30,7 @@ from PyQt5.QtWidgets import (
     QMenu,
     QDialog,
     QInputDialog,
+    QHeaderView,
 )
 
 from asyncua import ua
@@ -36,7 +40,13 @@ from uaclient.uaclient import UaClient
 from uaclient.mainwindow_ui import Ui_MainWindow
 from uaclient.connection_dialog import ConnectionDialog
 from uaclient.application_certificate_dialog import ApplicationCertificateDialog
+from uaclient.subscription_settings_dialog import SubscriptionSettingsDialog
+from uaclient.event_filter_dialog import EventFilterDialog
+from uaclient.event_filter import EventFilterSettings
 from uaclient.graphwidget import GraphUI
+from uaclient.subscription_model import SubscriptionModel
+from uaclient.event_model import EventModel, event_texts
+from uaclient.subscription_sets import SubscriptionSets
 
 from uawidgets.attrs_widget import AttrsWidget
 from uawidgets.tree_widget import TreeWidget
@@ -45,46 +55,152 @@ from uawidgets.utils import trycatchslot
 from uawidgets.logger import QtHandler
 from uawidgets.call_method_dialog import CallMethodDialog
 
-from uaclient.duckdb_logger import DuckDBLogger
+from uaclient.duckdb_logger import DuckDBLogger, event_record
+from uaclient.instrumentation import StageTimes
+from uaclient.node_stats import NodeStats
 
 logger = logging.getLogger(__name__)
 
 class DataChangeHandler(QObject):
-    data_change_fired = pyqtSignal(object, str, str)
+    """
+    process data change notifications in the asyncua thread: decode them, pass every
+    sample to the logger and keep the formatted latest value of each node, the GUI
+    receives those as one batch per frame, ready to display
+    metadata is the nodeid -> NodeMetadata dict of the subscribed nodes
+    with show_stats the live statistics of each node are updated and formatted too
+    """
+    data_changes_fired = pyqtSignal(dict)
+
+    def __init__(self, metadata, frame_rate=30):
+        QObject.__init__(self)
+        self.metadata = metadata
+        self.logger = None
+        self.show_stats = False
+        self.stage_times = StageTimes()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._times = dict.fromkeys(("decode", "log", "format", "stats", "queue"), 0.0)
+        self._count = 0
+        self._timer = QTimer(self)
+        self._timer.setInterval(max(1, int(1000 / frame_rate)))
+        self._timer.timeout.connect(self._emit_batch)
+        self._timer.start()
 
     def datachange_notification(self, node, val, data):
-        if data.monitored_item.Value.SourceTimestamp:
-            dato = data.monitored_item.Value.SourceTimestamp.isoformat()
-        elif data.monitored_item.Value.ServerTimestamp:
-            dato = data.monitored_item.Value.ServerTimestamp.isoformat()
-        else:
-            dato = datetime.now().isoformat()
-        self.data_change_fired.emit(node, str(val), dato)
+        t0 = time.perf_counter()
+        metadata = self.metadata.get(node.nodeid)
+        if metadata is None:
+            return  # late notification of a node that was unsubscribed
+        data_value = data.monitored_item.Value
+        receive_timestamp = datetime.now(timezone.utc)
+        variant_type = data_value.Value.VariantType if data_value.Value is not None else None
+        status_code = data_value.StatusCode.value if data_value.StatusCode is not None else None
+        t1 = time.perf_counter()
+        # timestamps stay datetimes all the way to the logger
+        if self.logger is not None:
+            self.logger.log_data(metadata.node_key, val, variant_type, data_value.SourceTimestamp,
+                                 data_value.ServerTimestamp, receive_timestamp, status_code)
+        timestamp = data_value.SourceTimestamp or data_value.ServerTimestamp or receive_timestamp
+        channel = metadata.channel
+        if channel is not None:
+            channel.append(timestamp, val)
+        t2 = time.perf_counter()
+        text = (str(val), timestamp.isoformat())
+        t3 = time.perf_counter()
+        if self.show_stats:
+            stats = metadata.stats
+            if stats is None:
+                stats = metadata.stats = NodeStats()
+            latency = None
+            source_timestamp = data_value.SourceTimestamp
+            if source_timestamp is not None:
+                if source_timestamp.tzinfo is None:
+                    source_timestamp = source_timestamp.replace(tzinfo=timezone.utc)
+                latency = (receive_timestamp - source_timestamp).total_seconds()
+            stats.add(val, time.monotonic(), latency)
+            text += (stats.texts(),)
+        t4 = time.perf_counter()
+        with self._lock:
+            self._pending[node.nodeid] = text
+            times = self._times
+            times["decode"] += t1 - t0
+            times["log"] += t2 - t1
+            times["format"] += t3 - t2
+            times["stats"] += t4 - t3
+            times["queue"] += time.perf_counter() - t4
+            self._count += 1
+
+    def _emit_batch(self):
+        with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+            times, count = self._times, self._count
+            self._times = dict.fromkeys(times, 0.0)
+            self._count = 0
+        self.stage_times.add_many(times, count)
+        self.data_changes_fired.emit(batch)
 
 class EventHandler(QObject):
-    event_fired = pyqtSignal(object)
+    """
+    process event notifications in the asyncua thread: decompose and log them and keep
+    the formatted rows, the GUI receives the new rows as one batch per frame
+    only the last capacity rows are kept between two frames, the view would drop older ones anyway
+    """
+    events_fired = pyqtSignal(list)
+
+    def __init__(self, capacity=10000, frame_rate=30):
+        QObject.__init__(self)
+        self.logger = None
+        self.server = None
+        self._lock = threading.Lock()
+        self._pending = deque(maxlen=capacity)
+        self._timer = QTimer(self)
+        self._timer.setInterval(max(1, int(1000 / frame_rate)))
+        self._timer.timeout.connect(self._emit_batch)
+        self._timer.start()
 
     def event_notification(self, event):
-        self.event_fired.emit(event)
+        record = event_record(event)
+        if self.logger is not None:
+            self.logger.log_event(record, datetime.now(timezone.utc), self.server)
+        row = event_texts(record)
+        with self._lock:
+            self._pending.append(row)
+
+    def _emit_batch(self):
+        with self._lock:
+            if not self._pending:
+                return
+            batch = list(self._pending)
+            self._pending.clear()
+        self.events_fired.emit(batch)
 
 class EventUI(object):
 
     def __init__(self, window, uaclient, logger):
         self.window = window
         self.uaclient = uaclient
-        self._handler = EventHandler()
+        # the event view keeps the last event_view_capacity events, all of them are logged
+        capacity = int(window.settings.value("event_view_capacity", 10000))
+        self._handler = EventHandler(capacity, float(window.settings.value("subscription_frame_rate", 30)))
+        self._handler.logger = logger
         self._subscribed_nodes = []  # FIXME: not really needed
-        self.model = QStandardItemModel()
+        self.model = EventModel(capacity)
         self.window.ui.evView.setModel(self.model)
+        self.window.ui.evView.horizontalHeader().setStretchLastSection(True)
+        # rows of equal height, the view does not measure them
+        self.window.ui.evView.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
         self.window.ui.actionSubscribeEvent.triggered.connect(self._subscribe)
         self.window.ui.actionUnsubscribeEvents.triggered.connect(self._unsubscribe)
+        self.window.ui.actionEventFilter.triggered.connect(self._edit_filter)
+        self.window.ui.evView.setContextMenuPolicy(Qt.ActionsContextMenu)
+        self.window.ui.evView.addAction(self.window.ui.actionEventFilter)
         # context menu
         self.window.addAction(self.window.ui.actionSubscribeEvent)
         self.window.addAction(self.window.ui.actionUnsubscribeEvents)
         self.window.addAction(self.window.ui.actionAddToGraph)
-        self._handler.event_fired.connect(
-            self._update_event_model, type=Qt.QueuedConnection
-        )
+        self._handler.events_fired.connect(self._update_event_model)
 
         self.duckdb_logger = logger
 
@@ -120,8 +236,9 @@ class EventUI(object):
         self.window.check_duckdb_connection_before_subcribe()
         logger.info("Subscribing to events for %s", node)
         self.window.ui.evDockWidget.raise_()
+        self._handler.server = self.window.server_uri
         try:
-            self.uaclient.subscribe_events(node, self._handler)
+            self.uaclient.subscribe_events(node, self._handler, self.window.get_event_filter().to_event_filter())
         except Exception as ex:
             self.window.show_error(ex)
             raise
@@ -135,45 +252,74 @@ class EventUI(object):
             return
         self._subscribed_nodes.remove(node)
         self.uaclient.unsubscribe_events(node)
-        self.window.check_duckdb_connection_after_unsubcribe()
 
     @trycatchslot
-    def _update_event_model(self, event):
-        self.model.appendRow([QStandardItem(str(event))])
-        self.log_duckdb(str(event), datetime.now())
+    def _edit_filter(self):
+        if self.window.show_event_filter_dialog() and self._subscribed_nodes:
+            # the filter of a monitored item is set when it is created
+            evfilter = self.window.get_event_filter().to_event_filter()
+            for node in self._subscribed_nodes:
+                self.uaclient.unsubscribe_events(node)
+                self.uaclient.subscribe_events(node, self._handler, evfilter)
+
+    @trycatchslot
+    def _update_event_model(self, rows):
+        # rows are formatted by the handler
+        self.model.add_rows(rows)
+
+def _settings(meta):
+    return meta.publishing_interval, meta.sampling_interval, meta.queue_size
 
-    def log_duckdb(self, event, timestamp):
-        if self.duckdb_logger:
-            self.duckdb_logger.log_event(
-                event, timestamp, self.window.server_uri
-            )
-        else:
-            print("DuckDB logger not initialized. Please set up logging first.")
 
 class DataChangeUI(object):
 
     def __init__(self, window, uaclient, logger):
         self.window = window
         self.uaclient = uaclient
-        self._subhandler = DataChangeHandler()
         self._subscribed_nodes = []
-        self.model = QStandardItemModel()
+        # nodeid -> NodeMetadata, read once at subscribe time so notifications need no server round trip
+        self._metadata = {}
+        # notifications reach the view at most this many times per second
+        self._subhandler = DataChangeHandler(self._metadata, float(window.settings.value("subscription_frame_rate", 30)))
+        self._subhandler.logger = logger
+        self.model = SubscriptionModel()
         self.window.ui.subView.setModel(self.model)
         self.window.ui.subView.horizontalHeader().setSectionResizeMode(1)
+        # rows of equal height, the view does not measure them
+        self.window.ui.subView.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
 
         self.duckdb_logger = logger
+        self.subscription_sets = SubscriptionSets(
+            window.settings.value("subscription_sets_path", str(Path.home() / "opcua_subscription_sets.json")))
+
+        # live statistics columns, hidden unless enabled in the settings
+        show_stats = window.settings.value("subscription_statistics", "false") in (True, "true")
+        self.window.ui.actionShowStatistics.setChecked(show_stats)
+        self.window.ui.actionShowStatistics.toggled.connect(self.show_statistics)
+        self.show_statistics(show_stats)
 
         self.window.ui.actionSubscribeDataChange.triggered.connect(self._subscribe)
         self.window.ui.actionUnsubscribeDataChange.triggered.connect(self._unsubscribe)
+        self.window.ui.actionSubscribeDataChangeBelow.triggered.connect(self._subscribe_below)
+        self.window.ui.actionUnsubscribeDataChangeBelow.triggered.connect(self._unsubscribe_below)
+        self.window.ui.actionSaveSubscriptionSet.triggered.connect(self._save_subscription_set)
+        self.window.ui.actionRestoreSubscriptionSet.triggered.connect(self._restore_subscription_set)
 
         # populate contextual menu
         self.window.addAction(self.window.ui.actionSubscribeDataChange)
         self.window.addAction(self.window.ui.actionUnsubscribeDataChange)
+        self.window.addAction(self.window.ui.actionSubscribeDataChangeBelow)
+        self.window.addAction(self.window.ui.actionUnsubscribeDataChangeBelow)
 
         # handle subscriptions
-        self._subhandler.data_change_fired.connect(
-            self._update_subscription_model, type=Qt.QueuedConnection
-        )
+        self._subhandler.data_changes_fired.connect(self._update_subscription_model)
+
+        # time spent per pipeline stage is logged periodically if enabled in the settings
+        self._instrumentation_timer = None
+        if window.settings.value("subscription_instrumentation", "false") in (True, "true"):
+            self._instrumentation_timer = QTimer()
+            self._instrumentation_timer.timeout.connect(self._log_stage_times)
+            self._instrumentation_timer.start(10000)
 
         # accept drops
         self.model.canDropMimeData = self.canDropMimeData
@@ -189,6 +335,8 @@ class DataChangeUI(object):
 
     def clear(self):
         self._subscribed_nodes = []
+        # the handler shares the dict
+        self._metadata.clear()
         self.model.clear()
 
     def show_error(self, *args):
@@ -196,70 +344,189 @@ class DataChangeUI(object):
 
     @trycatchslot
     def _subscribe(self, node=None):
-        if not isinstance(node, SyncNode):
-            node = self.window.get_current_node()
-            if node is None:
-                return
-        if node in self._subscribed_nodes:
-            logger.warning("allready subscribed to node: %s ", node)
+        if isinstance(node, SyncNode):
+            nodes = [node]
+        else:
+            nodes = self.window.get_selected_nodes()
+        self.subscribe_nodes(nodes)
+
+    @trycatchslot
+    def _subscribe_below(self):
+        nodes = self.window.get_selected_nodes()
+        if nodes:
+            self.subscribe_nodes(self.uaclient.browse_variables(nodes))
+
+    def subscribe_nodes(self, nodes, publishing_interval=None, sampling_interval=None, queue_size=None):
+        """
+        subscribe to data changes of all nodes with bulk requests,
+        nodes the server refuses are reported and left out
+        settings that are not given are taken from the subscription settings,
+        nodes subscribed with other settings are moved
+        """
+        defaults = self.window.get_subscription_settings()
+        settings = tuple(default if value is None else value
+                         for value, default in zip((publishing_interval, sampling_interval, queue_size), defaults))
+        moved = [node for node in nodes if node.nodeid in self._metadata and self._settings(node.nodeid) != settings]
+        self.unsubscribe_nodes(moved)
+        nodes = [node for node in nodes if node.nodeid not in self._metadata]
+        if not nodes:
+            return
+        metadata = self.uaclient.read_node_metadata(nodes)
+        for meta in metadata:
+            meta.publishing_interval, meta.sampling_interval, meta.queue_size = settings
+        self.subscribe_metadata(metadata)
+
+    def subscribe_metadata(self, metadata):
+        """
+        subscribe to data changes of nodes whose NodeMetadata, subscription settings included,
+        is known already, with bulk requests per publishing interval
+        """
+        moved = [meta.node for meta in metadata
+                 if meta.nodeid in self._metadata and self._settings(meta.nodeid) != _settings(meta)]
+        self.unsubscribe_nodes(moved)
+        metadata = [meta for meta in metadata if meta.nodeid not in self._metadata]
+        if not metadata:
             return
         self.window.check_duckdb_connection_before_subcribe()
-        self.model.setHorizontalHeaderLabels(["DisplayName", "Value", "Timestamp"])
-        text = str(node.read_display_name().Text)
-        row = [QStandardItem(text), QStandardItem("No Data yet"), QStandardItem("")]
-        row[0].setData(node)
-        self.model.appendRow(row)
-        self._subscribed_nodes.append(node)
-        self.window.ui.subDockWidget.raise_()
+        # the handler needs the metadata as soon as the first notification arrives
+        groups = {}
+        for meta in metadata:
+            self._register_node(meta)
+            self._metadata[meta.nodeid] = meta
+            groups.setdefault(_settings(meta), []).append(meta.node)
+        results = {}
+        failed = []
+        rows = []
         try:
-            self.uaclient.subscribe_datachange(node, self._subhandler)
-        except Exception as ex:
-            self.window.show_error(ex)
-            idx = self.model.indexFromItem(row[0])
-            self.model.takeRow(idx.row())
-            raise
+            for settings, nodes in groups.items():
+                results.update(self.uaclient.subscribe_datachange_nodes(nodes, self._subhandler, *settings))
+        finally:
+            # nodes not subscribed when a request raised are dropped like refused ones
+            for meta in metadata:
+                result = results.get(meta.nodeid)
+                if result is None or isinstance(result, ua.StatusCode):
+                    if result is not None:
+                        failed.append("{}: {}".format(meta.display_name, result.name))
+                    del self._metadata[meta.nodeid]
+                    continue
+                rows.append((meta.node, meta.display_name, "{} ms".format(meta.publishing_interval)))
+                self._subscribed_nodes.append(meta.node)
+            self.model.add_nodes(rows)
+        self.window.ui.subDockWidget.raise_()
+        if failed:
+            logger.warning("Could not subscribe to %s of %s nodes: %s", len(failed), len(metadata), ", ".join(failed))
+            self.window.show_error("Could not subscribe to {} of {} nodes".format(len(failed), len(metadata)))
 
     @trycatchslot
-    def _unsubscribe(self):
-        node = self.window.get_current_node()
-        if node is None:
+    def _save_subscription_set(self):
+        name, ok = QInputDialog.getItem(
+            self.window, "Save Subscription Set", "Name:", self.subscription_sets.names(), 0, True)
+        if ok and name:
+            self.save_subscription_set(name)
+
+    @trycatchslot
+    def _restore_subscription_set(self):
+        names = self.subscription_sets.names()
+        if not names:
+            self.window.show_error("No subscription set saved yet")
             return
-        self.uaclient.unsubscribe_datachange(node)
-        self._subscribed_nodes.remove(node)
-        i = 0
-        while self.model.item(i):
-            item = self.model.item(i)
-            if item.data() == node:
-                self.model.removeRow(i)
-            i += 1
-        self.window.check_duckdb_connection_after_unsubcribe()
-
-    def _update_subscription_model(self, node, value, timestamp):
-        i = 0
-        while self.model.item(i):
-            item = self.model.item(i)
-            if item.data() == node:
-                it = self.model.item(i, 1)
-                it.setText(value)
-                it_ts = self.model.item(i, 2)
-                it_ts.setText(timestamp)
-                # added duckdb logging
-                self.log_duckdb(
-                    display_name=str(node.read_display_name().Text),
-                    node_id=node.nodeid.to_string(),
-                    value=value,
-                    data_type=str(node.get_data_type_as_variant_type()),
-                    timestamp=timestamp,
-                )
-            i += 1
-
-    def log_duckdb(self, display_name, node_id, value, data_type, timestamp):
+        name, ok = QInputDialog.getItem(self.window, "Restore Subscription Set", "Name:", names, 0, False)
+        if ok:
+            self.restore_subscription_set(name)
+
+    def save_subscription_set(self, name):
+        self.subscription_sets.save(name, self._metadata.values(), self.uaclient.client.get_namespace_array())
+
+    def restore_subscription_set(self, name):
+        """
+        subscribe to the nodes of a saved set, with the metadata and settings stored in the set
+        """
+        metadata, missing = self.subscription_sets.load(
+            name, self.uaclient.client.get_namespace_array(), self.uaclient.get_node)
+        self.subscribe_metadata(metadata)
+        if missing:
+            logger.warning("Namespaces of %s nodes of set %s are unknown to the server: %s",
+                           len(missing), name, ", ".join(missing))
+            self.window.show_error("{} nodes of set {} are in namespaces unknown to the server".format(len(missing), name))
+
+    def _settings(self, nodeid):
+        return _settings(self._metadata[nodeid])
+
+    def _register_node(self, metadata):
         if self.duckdb_logger:
-            self.duckdb_logger.log_data(
-                display_name, node_id, value, data_type, timestamp, self.window.server_uri
+            metadata.node_key = self.duckdb_logger.register_node(
+                metadata.node_id, metadata.display_name, metadata.data_type_name, self.window.server_uri
             )
-        else:
-            print("DuckDB logger not initialized. Please set up logging first.")
+
+    @trycatchslot
+    def _unsubscribe(self):
+        self.unsubscribe_nodes(self.window.get_selected_nodes())
+
+    @trycatchslot
+    def _unsubscribe_below(self):
+        nodes = self.window.get_selected_nodes()
+        if nodes:
+            self.unsubscribe_nodes(self.uaclient.browse_variables(nodes))
+
+    def unsubscribe_nodes(self, nodes):
+        nodes = [node for node in nodes if node.nodeid in self._metadata]
+        if not nodes:
+            return
+        self.uaclient.unsubscribe_datachange_nodes(nodes)
+        nodeids = {node.nodeid for node in nodes}
+        self._subscribed_nodes = [node for node in self._subscribed_nodes if node.nodeid not in nodeids]
+        plotted = []
+        for nodeid in nodeids:
+            metadata = self._metadata.pop(nodeid)
+            if metadata.channel is not None:
+                plotted.append(metadata.node)
+        self.model.remove_nodes(nodeids)
+        # the graph gets no more samples of these nodes
+        for node in plotted:
+            self.window.graph_ui.remove_node(node)
+
+    def attach_channels(self, channels):
+        """
+        append the samples of each node of the (node, channel) pairs to its graph channel,
+        subscribing to the nodes that are not subscribed yet, return the nodes that could not be
+        """
+        self.subscribe_nodes([node for node, _ in channels if node.nodeid not in self._metadata])
+        failed = []
+        for node, channel in channels:
+            metadata = self._metadata.get(node.nodeid)
+            if metadata is None:
+                failed.append(node)
+            else:
+                metadata.channel = channel
+        return failed
+
+    def detach_channel(self, node):
+        metadata = self._metadata.get(node.nodeid)
+        if metadata is not None:
+            metadata.channel = None
+
+    def show_statistics(self, show):
+        self.window.settings.setValue("subscription_statistics", show)
+        self._subhandler.show_stats = show
+        if not show:
+            # statistics start over when shown again
+            for metadata in self._metadata.values():
+                metadata.stats = None
+            self.model.clear_stats()
+        for column in range(self.model.STATS_COLUMN, self.model.columnCount()):
+            self.window.ui.subView.setColumnHidden(column, not show)
+
+    def _update_subscription_model(self, changes):
+        # changes are formatted by the handler, only the latest value of each node is left
+        start = time.perf_counter()
+        self.model.update(changes)
+        self._subhandler.stage_times.add("apply", time.perf_counter() - start, len(changes))
+
+    def _log_stage_times(self):
+        summary = self._subhandler.stage_times.summary()
+        if summary:
+            logger.info("Data change pipeline: %s", summary)
+        self._subhandler.stage_times.reset()
 
     def closeEvent(self, event):
         if hasattr(self, "duckdb_logger") and self.duckdb_logger:
@@ -286,11 +553,11 @@ class StaticDataUI(object):
         self.window.ui.staticDataView.resizeColumnToContents(4)
 
         self.duckdb_logger = logger
+        self.max_rows = 100
+        self._watermark = None  # seq of the newest row shown
 
         self.window.ui.buttonRefresh.clicked.connect(self.refresh)
 
-        self.result = self.duckdb_logger.get_last_10_data(self.window.default_duckdb_path)
-
         self.refresh()
 
         self.timer = QTimer()
@@ -299,15 +566,40 @@ class StaticDataUI(object):
         self.timer.start()
 
     def refresh(self):
-        self.result = self.duckdb_logger.get_last_10_data(self.window.default_duckdb_path)
-        if self.result is None:
+        # only rows newer than the watermark are fetched, the view keeps the newest max_rows
+        if not self.duckdb_logger.check_if_open():
             return
-        self.clear()
-        for item in self.result:
-            self.model.appendRow([QStandardItem(str(item[0])), QStandardItem(str(item[1])), QStandardItem(str(item[2])),
-                                  QStandardItem(str(item[3])), QStandardItem(str(item[4]))])
-
+        try:
+            self.result = self.duckdb_logger.get_data_since(self._watermark, self.max_rows)
+        except Exception as ex:
+            logger.warning("Unable to read from duckdb: %s", ex)
+            return
+        if not self.result:
+            return
+        self._watermark = self.result[0][0]
+        for item in reversed(self.result):
+            row = [QStandardItem(str(value)) for value in item[1:]]
+            row[0].setData(item[0], Qt.UserRole)
+            self.model.insertRow(0, row)
+        self._trim()
+        # new rows go where the column the view is sorted by puts them
+        header = self.window.ui.staticDataView.horizontalHeader()
+        self.model.sort(header.sortIndicatorSection(), header.sortIndicatorOrder())
+
+    def _trim(self):
+        # the view may be sorted by any column, the rows with the oldest seq are removed, wherever they are
+        excess = self.model.rowCount() - self.max_rows
+        if excess <= 0:
+            return
+        rows = sorted(range(self.model.rowCount()), key=lambda row: self.model.item(row, 0).data(Qt.UserRole))
+        for row in sorted(rows[:excess], reverse=True):
+            self.model.removeRow(row)
 
+    def reset(self):
+        # the logger switched to another file, start tailing it from scratch
+        self.clear()
+        self._watermark = None
+        self.refresh()
 
     def clear(self):
         # remove all rows but not header!!
@@ -315,10 +607,9 @@ class StaticDataUI(object):
         self.node = None
 
 
-
 class Window(QMainWindow):
 
-    def __init__(self):
+    def __init__(self, duckdb_path=None):
         QMainWindow.__init__(self)
         self.ui = Ui_MainWindow()
         self.ui.setupUi(self)
@@ -328,13 +619,6 @@ class Window(QMainWindow):
 
         self.setWindowIcon(QIcon(":/network.svg"))
 
-        # ... existing initialization code ...
-        self.duckdb_logger = None
-
-        # Initialize DuckDBLogger with default path
-        self.default_duckdb_path = self.get_default_duckdb_path()
-        self.setup_duckdb_logging()
-
         # fix stuff imposible to do in qtdesigner
         # remove dock titlebar for addressbar
         w = QWidget()
@@ -353,6 +637,14 @@ class Window(QMainWindow):
         QCoreApplication.setApplicationName("OpcUaClient")
         self.settings = QSettings()
         self.server_uri = ""
+
+        # ... existing initialization code ...
+        self.duckdb_logger = None
+
+        # Initialize DuckDBLogger with default path, ~/opcua.duckdb unless duckdb_path is given
+        self.default_duckdb_path = duckdb_path or self.get_default_duckdb_path()
+        self.setup_duckdb_logging()
+
         self.settings.setValue(
             "address_list",
             [
@@ -433,6 +725,7 @@ class Window(QMainWindow):
             self.show_application_certificate_dialog
         )
         self.ui.actionDark_Mode.triggered.connect(self.dark_mode)
+        self.ui.actionSubscriptionSettings.triggered.connect(self.show_subscription_settings_dialog)
 
     def get_default_duckdb_path(self):
         home_dir = Path.home()
@@ -457,10 +750,21 @@ class Window(QMainWindow):
                 f"DuckDB logging configured successfully!\nPath: {db_path}",
             )
 
-    def setup_duckdb_logging(self):
+    def setup_duckdb_logging(self, db_path=None):
+        # the logger keeps one connection open for the whole session, history views read through it
+        if db_path:
+            self.default_duckdb_path = db_path
         if self.duckdb_logger:
             self.duckdb_logger.close()  # Close existing connection if any
-        self.duckdb_logger = DuckDBLogger()
+        else:
+            # hourly Parquet rotation is enabled by setting a directory, e.g. ~/opcua_parquet
+            rotation_dir = self.settings.value("duckdb_rotation_dir", "") or None
+            self.duckdb_logger = DuckDBLogger(rotation_dir=rotation_dir)
+        # if the file is locked the logger keeps rows in a journal until it can open it
+        self.duckdb_logger.connect(self.default_duckdb_path)
+        # keys of subscribed nodes stay valid, the logger maps them to the nodes of the new file
+        if hasattr(self, "static_ui"):
+            self.static_ui.reset()
 
     def _uri_changed(self, uri):
         self.uaclient.load_security_settings(uri)
@@ -488,6 +792,54 @@ class Window(QMainWindow):
             self.uaclient.application_private_key_path = dia.private_key_path
         self.uaclient.save_application_certificate_settings()
 
+    def get_subscription_settings(self):
+        """
+        return publishing interval, sampling interval and queue size for new data change subscriptions
+        """
+        return (
+            int(self.settings.value("subscription_publishing_interval", 500)),
+            int(self.settings.value("subscription_sampling_interval", 0)),
+            int(self.settings.value("subscription_queue_size", 0)),
+        )
+
+    def show_subscription_settings_dialog(self):
+        dia = SubscriptionSettingsDialog(self)
+        dia.publishing_interval, dia.sampling_interval, dia.queue_size = self.get_subscription_settings()
+        if dia.exec_() == QDialog.Accepted:
+            self.settings.setValue("subscription_publishing_interval", dia.publishing_interval)
+            self.settings.setValue("subscription_sampling_interval", dia.sampling_interval)
+            self.settings.setValue("subscription_queue_size", dia.queue_size)
+
+    def get_event_filter(self):
+        """
+        return the EventFilterSettings for event subscriptions
+        """
+        fields = self.settings.value("event_filter_fields", None)
+        event_type = self.settings.value("event_filter_type", "")
+        source_node = self.settings.value("event_filter_source", "")
+        return EventFilterSettings(
+            fields.split(",") if fields else EventFilterSettings().fields,
+            ua.NodeId.from_string(event_type) if event_type else None,
+            int(self.settings.value("event_filter_min_severity", 0)),
+            ua.NodeId.from_string(source_node) if source_node else None,
+        )
+
+    def show_event_filter_dialog(self):
+        """
+        return True if the filter was changed
+        """
+        dia = EventFilterDialog(self)
+        dia.event_filter = self.get_event_filter()
+        if dia.exec_() != QDialog.Accepted:
+            return False
+        evfilter = dia.event_filter
+        self.settings.setValue("event_filter_fields", ",".join(evfilter.fields))
+        self.settings.setValue("event_filter_type", evfilter.event_type.to_string())
+        self.settings.setValue("event_filter_min_severity", evfilter.min_severity)
+        self.settings.setValue("event_filter_source",
+                               evfilter.source_node.to_string() if evfilter.source_node is not None else "")
+        return True
+
     @trycatchslot
     def show_refs(self, selection):
         if isinstance(selection, QItemSelection):
@@ -520,6 +872,13 @@ class Window(QMainWindow):
     def get_current_node(self, idx=None):
         return self.tree_ui.get_current_node(idx)
 
+    def get_selected_nodes(self):
+        idxs = self.ui.treeView.selectionModel().selectedRows()
+        if not idxs:
+            node = self.get_current_node()
+            return [] if node is None else [node]
+        return [self.get_current_node(idx) for idx in idxs]
+
     def get_uaclient(self):
         return self.uaclient
 
@@ -559,9 +918,9 @@ class Window(QMainWindow):
             self.tree_ui.clear()
             self.refs_ui.clear()
             self.attrs_ui.clear()
+            self.graph_ui.clear()
             self.datachange_ui.clear()
             self.event_ui.clear()
-            self.duckdb_logger.close()
 
     def closeEvent(self, event):
         self.tree_ui.save_state()
@@ -572,6 +931,8 @@ class Window(QMainWindow):
         self.settings.setValue("main_window_state", self.saveState())
         self.settings.setValue("address_list", self._address_list)
         self.disconnect()
+        self.static_ui.timer.stop()
+        self.duckdb_logger.close()
         event.accept()
 
     def save_current_node(self):
@@ -635,11 +996,6 @@ class Window(QMainWindow):
         msg.setText("Restart for changes to take effect")
         msg.exec_()
 
-    # Checks if there is no datachange or eventchange subscribtion. If there is not, the duckdb logger gets closed
-    def check_duckdb_connection_after_unsubcribe(self):
-        if len(self.event_ui._subscribed_nodes) == 0 and len(self.datachange_ui._subscribed_nodes) == 0:
-            self.duckdb_logger.close()
-
     def check_if_sub_list_empty(self):
         if len(self.event_ui._subscribed_nodes) == 0 and len(self.datachange_ui._subscribed_nodes) == 0:
             return True
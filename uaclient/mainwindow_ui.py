@@ -43,6 +43,7 @@ class Ui_MainWindow(object):
         self.treeView.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         self.treeView.setDragEnabled(True)
         self.treeView.setDragDropMode(QtWidgets.QAbstractItemView.DragOnly)
+        self.treeView.setSelectionMode(QtWidgets.QAbstractItemView.ExtendedSelection)
         self.treeView.setObjectName("treeView")
         self.gridLayout_2.addWidget(self.splitter, 0, 0, 1, 1)
         MainWindow.setCentralWidget(self.centralWidget)
@@ -209,7 +210,7 @@ class Ui_MainWindow(object):
         self.gridLayout_5.setContentsMargins(11, 11, 11, 11)
         self.gridLayout_5.setSpacing(6)
         self.gridLayout_5.setObjectName("gridLayout_5")
-        self.evView = QtWidgets.QListView(self.dockWidgetContents_5)
+        self.evView = QtWidgets.QTableView(self.dockWidgetContents_5)
         self.evView.setFocusPolicy(QtCore.Qt.StrongFocus)
         self.evView.setAcceptDrops(True)
         self.evView.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
@@ -253,7 +254,7 @@ class Ui_MainWindow(object):
         self.horizontalLayout.addWidget(self.labelNumberOfPoints)
         self.spinBoxNumberOfPoints = QtWidgets.QSpinBox(self.dockWidgetContents_6)
         self.spinBoxNumberOfPoints.setMinimum(10)
-        self.spinBoxNumberOfPoints.setMaximum(100)
+        self.spinBoxNumberOfPoints.setMaximum(1000000)
         self.spinBoxNumberOfPoints.setProperty("value", 30)
         self.spinBoxNumberOfPoints.setObjectName("spinBoxNumberOfPoints")
         self.horizontalLayout.addWidget(self.spinBoxNumberOfPoints)
@@ -266,6 +267,9 @@ class Ui_MainWindow(object):
         self.spinBoxIntervall.setProperty("value", 5)
         self.spinBoxIntervall.setObjectName("spinBoxIntervall")
         self.horizontalLayout.addWidget(self.spinBoxIntervall)
+        self.checkBoxPolling = QtWidgets.QCheckBox(self.dockWidgetContents_6)
+        self.checkBoxPolling.setObjectName("checkBoxPolling")
+        self.horizontalLayout.addWidget(self.checkBoxPolling)
         self.buttonApply = QtWidgets.QPushButton(self.dockWidgetContents_6)
         self.buttonApply.setObjectName("buttonApply")
         self.horizontalLayout.addWidget(self.buttonApply)
@@ -308,10 +312,25 @@ class Ui_MainWindow(object):
         self.actionDisconnect.setObjectName("actionDisconnect")
         self.actionSetupDuckDBLogging = QtWidgets.QAction(MainWindow)
         self.actionSetupDuckDBLogging.setObjectName("actionSetupDuckDBLogging")
+        self.actionSubscriptionSettings = QtWidgets.QAction(MainWindow)
+        self.actionSubscriptionSettings.setObjectName("actionSubscriptionSettings")
+        self.actionShowStatistics = QtWidgets.QAction(MainWindow)
+        self.actionShowStatistics.setCheckable(True)
+        self.actionShowStatistics.setObjectName("actionShowStatistics")
+        self.actionEventFilter = QtWidgets.QAction(MainWindow)
+        self.actionEventFilter.setObjectName("actionEventFilter")
+        self.actionSaveSubscriptionSet = QtWidgets.QAction(MainWindow)
+        self.actionSaveSubscriptionSet.setObjectName("actionSaveSubscriptionSet")
+        self.actionRestoreSubscriptionSet = QtWidgets.QAction(MainWindow)
+        self.actionRestoreSubscriptionSet.setObjectName("actionRestoreSubscriptionSet")
         self.actionSubscribeDataChange = QtWidgets.QAction(MainWindow)
         self.actionSubscribeDataChange.setObjectName("actionSubscribeDataChange")
         self.actionUnsubscribeDataChange = QtWidgets.QAction(MainWindow)
         self.actionUnsubscribeDataChange.setObjectName("actionUnsubscribeDataChange")
+        self.actionSubscribeDataChangeBelow = QtWidgets.QAction(MainWindow)
+        self.actionSubscribeDataChangeBelow.setObjectName("actionSubscribeDataChangeBelow")
+        self.actionUnsubscribeDataChangeBelow = QtWidgets.QAction(MainWindow)
+        self.actionUnsubscribeDataChangeBelow.setObjectName("actionUnsubscribeDataChangeBelow")
         self.actionSubscribeEvent = QtWidgets.QAction(MainWindow)
         self.actionSubscribeEvent.setObjectName("actionSubscribeEvent")
         self.actionUnsubscribeEvents = QtWidgets.QAction(MainWindow)
@@ -337,11 +356,18 @@ class Ui_MainWindow(object):
         self.menuOPC_UA_Client.addAction(self.actionCopyNodeId)
         self.menuOPC_UA_Client.addAction(self.actionSubscribeDataChange)
         self.menuOPC_UA_Client.addAction(self.actionUnsubscribeDataChange)
+        self.menuOPC_UA_Client.addAction(self.actionSubscribeDataChangeBelow)
+        self.menuOPC_UA_Client.addAction(self.actionUnsubscribeDataChangeBelow)
+        self.menuOPC_UA_Client.addAction(self.actionSaveSubscriptionSet)
+        self.menuOPC_UA_Client.addAction(self.actionRestoreSubscriptionSet)
         self.menuOPC_UA_Client.addAction(self.actionSubscribeEvent)
         self.menuOPC_UA_Client.addAction(self.actionUnsubscribeEvents)
         self.menuSettings.addAction(self.actionDark_Mode)
         self.menuSettings.addAction(self.actionClient_Application_Certificate)
         self.menuSettings.addAction(self.actionSetupDuckDBLogging)
+        self.menuSettings.addAction(self.actionSubscriptionSettings)
+        self.menuSettings.addAction(self.actionShowStatistics)
+        self.menuSettings.addAction(self.actionEventFilter)
         self.menuBar.addAction(self.menuOPC_UA_Client.menuAction())
         self.menuBar.addAction(self.menuSettings.menuAction())
 
@@ -378,6 +404,8 @@ class Ui_MainWindow(object):
         self.graphDockWidget.setWindowTitle(_translate("MainWindow", "&GraphDonut"))
         self.labelNumberOfPoints.setText(_translate("MainWindow", "Number of Points"))
         self.labelIntervall.setText(_translate("MainWindow", "Intervall [s]"))
+        self.checkBoxPolling.setToolTip(_translate("MainWindow", "Read all plotted nodes once per interval instead of subscribing to them"))
+        self.checkBoxPolling.setText(_translate("MainWindow", "Poll"))
         self.buttonApply.setText(_translate("MainWindow", "Apply"))
         self.staticDataDockWidget.setWindowTitle(_translate("MainWindow", "History View"))
         self.buttonRefresh.setText(_translate("MainWindow", "Refresh"))
@@ -386,10 +414,24 @@ class Ui_MainWindow(object):
         self.actionDisconnect.setToolTip(_translate("MainWindow", "Disconnect from server"))
         self.actionSetupDuckDBLogging.setText(_translate("MainWindow", "Setup DuckDB Logging"))
         self.actionSetupDuckDBLogging.setToolTip(_translate("MainWindow", "Configure DuckDB logging settings"))
+        self.actionSubscriptionSettings.setText(_translate("MainWindow", "Data Change Subscription Settings"))
+        self.actionSubscriptionSettings.setToolTip(_translate("MainWindow", "Publishing interval, sampling interval and queue size of new data change subscriptions"))
+        self.actionShowStatistics.setText(_translate("MainWindow", "Show Live Statistics"))
+        self.actionShowStatistics.setToolTip(_translate("MainWindow", "Show updates per second, min, max, mean, interval and latency of the subscribed nodes"))
+        self.actionEventFilter.setText(_translate("MainWindow", "Event &Filter..."))
+        self.actionEventFilter.setToolTip(_translate("MainWindow", "Fields, event type, severity and source node of the events the server sends"))
+        self.actionSaveSubscriptionSet.setText(_translate("MainWindow", "Sa&ve Subscription Set..."))
+        self.actionSaveSubscriptionSet.setToolTip(_translate("MainWindow", "Save the subscribed nodes and their settings as a named set"))
+        self.actionRestoreSubscriptionSet.setText(_translate("MainWindow", "&Restore Subscription Set..."))
+        self.actionRestoreSubscriptionSet.setToolTip(_translate("MainWindow", "Subscribe to the nodes of a saved set"))
         self.actionSubscribeDataChange.setText(_translate("MainWindow", "&Subscribe to data change"))
         self.actionSubscribeDataChange.setToolTip(_translate("MainWindow", "Subscribe to data change from selected node"))
         self.actionUnsubscribeDataChange.setText(_translate("MainWindow", "&Unsubscribe to DataChange"))
         self.actionUnsubscribeDataChange.setToolTip(_translate("MainWindow", "Unsubscribe to DataChange for current node"))
+        self.actionSubscribeDataChangeBelow.setText(_translate("MainWindow", "Subscribe to data change of &all variables below"))
+        self.actionSubscribeDataChangeBelow.setToolTip(_translate("MainWindow", "Subscribe to data change of every variable below the selected nodes"))
+        self.actionUnsubscribeDataChangeBelow.setText(_translate("MainWindow", "Unsubscribe to DataChange of all variables &below"))
+        self.actionUnsubscribeDataChangeBelow.setToolTip(_translate("MainWindow", "Unsubscribe to DataChange of every variable below the selected nodes"))
         self.actionSubscribeEvent.setText(_translate("MainWindow", "Subscribe to &events"))
         self.actionSubscribeEvent.setToolTip(_translate("MainWindow", "Subscribe to events from selected node"))
         self.actionUnsubscribeEvents.setText(_translate("MainWindow", "U&nsubscribe to Events"))
@@ -0,0 +1,78 @@
+import math
+
+
+class NodeStats:
+    """
+    Running statistics of the samples of one node, every sample updates them in O(1)
+    rate is a count decayed over rate_window seconds, mean an exponentially weighted
+    moving average with weight alpha, booleans count as 0/1 and other values
+    that are not numbers only count for rate and interval
+    """
+
+    __slots__ = ("alpha", "rate_window", "count", "min", "max", "mean", "interval", "latency",
+                 "_rate", "_first_arrival", "_last_arrival")
+
+    HEADERS = ("Updates/s", "Min", "Max", "Mean", "Interval", "Latency")
+
+    def __init__(self, alpha=0.1, rate_window=10.0):
+        self.alpha = alpha
+        self.rate_window = rate_window
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.mean = None
+        self.interval = None
+        self.latency = None
+        self._rate = 0.0
+        self._first_arrival = None
+        self._last_arrival = None
+
+    def add(self, value, arrival, latency=None):
+        """
+        arrival is a time.monotonic() time, latency the seconds from source timestamp to arrival
+        """
+        if self._last_arrival is None:
+            self._first_arrival = arrival
+        else:
+            self.interval = arrival - self._last_arrival
+            self._rate *= math.exp(-self.interval / self.rate_window)
+        self._rate += 1.0 / self.rate_window
+        self._last_arrival = arrival
+        self.count += 1
+        self.latency = latency
+        if isinstance(value, (int, float)) and not (isinstance(value, float) and math.isnan(value)):
+            value = float(value)
+            if self.mean is None:
+                self.min = self.max = self.mean = value
+            else:
+                if value < self.min:
+                    self.min = value
+                elif value > self.max:
+                    self.max = value
+                self.mean += self.alpha * (value - self.mean)
+
+    @property
+    def rate(self):
+        """
+        updates per second at the last arrival
+        """
+        if self._last_arrival is None:
+            return 0.0
+        elapsed = self._last_arrival - self._first_arrival
+        if elapsed <= 0:
+            return 0.0
+        # the decayed count is still building up during the first rate_window seconds
+        return self._rate / (1.0 - math.exp(-elapsed / self.rate_window))
+
+    def texts(self):
+        """
+        return the statistics formatted for the columns in HEADERS
+        """
+        return (
+            "{:.2f}".format(self.rate),
+            "" if self.min is None else "{:.6g}".format(self.min),
+            "" if self.max is None else "{:.6g}".format(self.max),
+            "" if self.mean is None else "{:.6g}".format(self.mean),
+            "" if self.interval is None else "{:.3f} s".format(self.interval),
+            "" if self.latency is None else "{:.3f} s".format(self.latency),
+        )
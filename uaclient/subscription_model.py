@@ -0,0 +1,157 @@
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from uaclient.node_stats import NodeStats
+
+
+class SubscriptionModel(QAbstractTableModel):
+    """
+    Table model of the subscription view
+    every column is a plain list with one entry per subscribed node, values and
+    timestamps are kept formatted, so painting a cell is a list lookup
+    a batch of updates emits a single dataChanged covering the rows it touched
+    the live statistics of a node are kept as one tuple of texts per row
+    """
+
+    HEADERS = ("DisplayName", "Value", "Timestamp", "Subscription") + NodeStats.HEADERS
+    STATS_COLUMN = 4
+    _NO_STATS = ("",) * len(NodeStats.HEADERS)
+
+    def __init__(self, parent=None):
+        QAbstractTableModel.__init__(self, parent)
+        self._nodes = []
+        self._names = []
+        self._values = []
+        self._timestamps = []
+        self._subscriptions = []
+        self._stats = []
+        # nodeid -> row
+        self._rows = {}
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._nodes)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return None
+        column = index.column()
+        if column == 0:
+            return self._names[index.row()]
+        if column == 1:
+            return self._values[index.row()]
+        if column == 2:
+            return self._timestamps[index.row()]
+        if column == 3:
+            return self._subscriptions[index.row()]
+        return self._stats[index.row()][column - self.STATS_COLUMN]
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.HEADERS[section]
+        return QAbstractTableModel.headerData(self, section, orientation, role)
+
+    def flags(self, index):
+        # nodes are dropped on the view to subscribe them
+        return QAbstractTableModel.flags(self, index) | Qt.ItemIsDropEnabled
+
+    def mimeTypes(self):
+        return ["text/plain"]
+
+    def node(self, row):
+        return self._nodes[row]
+
+    def row(self, nodeid):
+        return self._rows.get(nodeid)
+
+    def add_node(self, node, name, subscription=""):
+        self.add_nodes([(node, name, subscription)])
+
+    def add_nodes(self, rows):
+        """
+        append (node, name, subscription) rows in one insert
+        """
+        if not rows:
+            return
+        first = len(self._nodes)
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        for row, (node, name, subscription) in enumerate(rows, first):
+            self._nodes.append(node)
+            self._names.append(name)
+            self._values.append("No Data yet")
+            self._timestamps.append("")
+            self._subscriptions.append(subscription)
+            self._stats.append(self._NO_STATS)
+            self._rows[node.nodeid] = row
+        self.endInsertRows()
+
+    def remove_node(self, nodeid):
+        row = self._rows.pop(nodeid, None)
+        if row is None:
+            return
+        self.beginRemoveRows(QModelIndex(), row, row)
+        for column in (self._nodes, self._names, self._values, self._timestamps, self._subscriptions,
+                       self._stats):
+            del column[row]
+        for node in self._nodes[row:]:
+            self._rows[node.nodeid] -= 1
+        self.endRemoveRows()
+
+    def remove_nodes(self, nodeids):
+        if len(nodeids) == 1:
+            self.remove_node(next(iter(nodeids)))
+            return
+        # removing many rows one by one would shift the remaining rows each time
+        self.beginResetModel()
+        keep = [row for row, node in enumerate(self._nodes) if node.nodeid not in nodeids]
+        self._nodes = [self._nodes[row] for row in keep]
+        self._names = [self._names[row] for row in keep]
+        self._values = [self._values[row] for row in keep]
+        self._timestamps = [self._timestamps[row] for row in keep]
+        self._subscriptions = [self._subscriptions[row] for row in keep]
+        self._stats = [self._stats[row] for row in keep]
+        self._rows = {node.nodeid: row for row, node in enumerate(self._nodes)}
+        self.endResetModel()
+
+    def clear(self):
+        self.beginResetModel()
+        self._nodes = []
+        self._names = []
+        self._values = []
+        self._timestamps = []
+        self._subscriptions = []
+        self._stats = []
+        self._rows = {}
+        self.endResetModel()
+
+    def clear_stats(self):
+        if not self._stats:
+            return
+        self._stats = [self._NO_STATS] * len(self._stats)
+        self.dataChanged.emit(self.index(0, self.STATS_COLUMN), self.index(len(self._stats) - 1, len(self.HEADERS) - 1),
+                              [Qt.DisplayRole])
+
+    def update(self, changes):
+        """
+        changes maps nodeid to the (value, timestamp) texts to show,
+        or to (value, timestamp, stats) with the texts of the statistics columns
+        """
+        first = last = None
+        last_column = 2
+        for nodeid, texts in changes.items():
+            row = self._rows.get(nodeid)
+            if row is None:
+                continue
+            self._values[row] = texts[0]
+            self._timestamps[row] = texts[1]
+            if len(texts) > 2:
+                self._stats[row] = texts[2]
+                last_column = len(self.HEADERS) - 1
+            if first is None:
+                first = last = row
+            else:
+                first = min(first, row)
+                last = max(last, row)
+        if first is not None:
+            self.dataChanged.emit(self.index(first, 1), self.index(last, last_column), [Qt.DisplayRole])
@@ -0,0 +1,97 @@
+import json
+import os
+
+from asyncua import ua
+
+from uaclient.uaclient import NodeMetadata
+
+
+class SubscriptionSets(object):
+    """
+    Named sets of subscribed nodes, kept in a JSON file
+    a set stores the metadata and subscription settings of its nodes together with
+    the namespace array of the server, so it is subscribed again without any read per node
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def names(self):
+        return sorted(self._load())
+
+    def save(self, name, metadata, namespaces):
+        sets = self._load()
+        sets[name] = {
+            "namespaces": list(namespaces),
+            "nodes": [_metadata_to_dict(meta) for meta in metadata],
+        }
+        self._dump(sets)
+
+    def remove(self, name):
+        sets = self._load()
+        del sets[name]
+        self._dump(sets)
+
+    def load(self, name, namespaces, get_node):
+        """
+        return the NodeMetadata of the nodes of a set and the node ids that could not be mapped
+        namespace indexes are mapped by URI to namespaces, the current namespace array of the server
+        get_node turns a NodeId into a node
+        """
+        saved = self._load()[name]
+        index_map = {index: namespaces.index(uri) for index, uri in enumerate(saved["namespaces"]) if uri in namespaces}
+        index_map[0] = 0
+        metadata = []
+        missing = []
+        for entry in saved["nodes"]:
+            nodeid = _map_nodeid(ua.NodeId.from_string(entry["node_id"]), index_map)
+            if nodeid is None:
+                missing.append(entry["node_id"])
+                continue
+            data_type = entry["data_type"]
+            if data_type is not None:
+                data_type = _map_nodeid(ua.NodeId.from_string(data_type), index_map)
+            variant_type = entry["variant_type"]
+            if variant_type is not None:
+                variant_type = ua.VariantType[variant_type]
+            meta = NodeMetadata(get_node(nodeid), entry["display_name"], data_type, variant_type)
+            meta.publishing_interval = entry["publishing_interval"]
+            meta.sampling_interval = entry["sampling_interval"]
+            meta.queue_size = entry["queue_size"]
+            metadata.append(meta)
+        return metadata, missing
+
+    def _load(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _dump(self, sets):
+        # a crash while writing leaves the previous file in place
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(sets, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def _metadata_to_dict(meta):
+    return {
+        "node_id": meta.node_id,
+        "display_name": meta.display_name,
+        "data_type": meta.data_type.to_string() if meta.data_type is not None else None,
+        "variant_type": meta.variant_type.name if meta.variant_type is not None else None,
+        "publishing_interval": meta.publishing_interval,
+        "sampling_interval": meta.sampling_interval,
+        "queue_size": meta.queue_size,
+    }
+
+
+def _map_nodeid(nodeid, index_map):
+    index = index_map.get(nodeid.NamespaceIndex)
+    if index is None:
+        return None
+    if index == nodeid.NamespaceIndex:
+        return nodeid
+    return ua.NodeId(nodeid.Identifier, index, nodeid.NodeIdType)
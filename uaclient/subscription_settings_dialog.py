@@ -0,0 +1,38 @@
+from PyQt5.QtWidgets import QDialog
+
+from uaclient.subscription_settings_ui import Ui_SubscriptionSettingsDialog
+
+
+class SubscriptionSettingsDialog(QDialog):
+    """
+    publishing interval, sampling interval and queue size used for the next data change subscriptions
+    """
+
+    def __init__(self, parent):
+        QDialog.__init__(self, parent)
+        self.ui = Ui_SubscriptionSettingsDialog()
+        self.ui.setupUi(self)
+
+    @property
+    def publishing_interval(self):
+        return self.ui.publishingIntervalSpinBox.value()
+
+    @publishing_interval.setter
+    def publishing_interval(self, value):
+        self.ui.publishingIntervalSpinBox.setValue(int(value))
+
+    @property
+    def sampling_interval(self):
+        return self.ui.samplingIntervalSpinBox.value()
+
+    @sampling_interval.setter
+    def sampling_interval(self, value):
+        self.ui.samplingIntervalSpinBox.setValue(int(value))
+
+    @property
+    def queue_size(self):
+        return self.ui.queueSizeSpinBox.value()
+
+    @queue_size.setter
+    def queue_size(self, value):
+        self.ui.queueSizeSpinBox.setValue(int(value))
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file '.\uaclient\subscription_settings_ui.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.11
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_SubscriptionSettingsDialog(object):
+    def setupUi(self, SubscriptionSettingsDialog):
+        SubscriptionSettingsDialog.setObjectName("SubscriptionSettingsDialog")
+        SubscriptionSettingsDialog.resize(360, 150)
+        self.formLayout = QtWidgets.QFormLayout(SubscriptionSettingsDialog)
+        self.formLayout.setObjectName("formLayout")
+        self.publishingIntervalLabel = QtWidgets.QLabel(SubscriptionSettingsDialog)
+        self.publishingIntervalLabel.setObjectName("publishingIntervalLabel")
+        self.formLayout.setWidget(0, QtWidgets.QFormLayout.LabelRole, self.publishingIntervalLabel)
+        self.publishingIntervalSpinBox = QtWidgets.QSpinBox(SubscriptionSettingsDialog)
+        self.publishingIntervalSpinBox.setMinimum(10)
+        self.publishingIntervalSpinBox.setMaximum(3600000)
+        self.publishingIntervalSpinBox.setProperty("value", 500)
+        self.publishingIntervalSpinBox.setObjectName("publishingIntervalSpinBox")
+        self.formLayout.setWidget(0, QtWidgets.QFormLayout.FieldRole, self.publishingIntervalSpinBox)
+        self.samplingIntervalLabel = QtWidgets.QLabel(SubscriptionSettingsDialog)
+        self.samplingIntervalLabel.setObjectName("samplingIntervalLabel")
+        self.formLayout.setWidget(1, QtWidgets.QFormLayout.LabelRole, self.samplingIntervalLabel)
+        self.samplingIntervalSpinBox = QtWidgets.QSpinBox(SubscriptionSettingsDialog)
+        self.samplingIntervalSpinBox.setMaximum(3600000)
+        self.samplingIntervalSpinBox.setObjectName("samplingIntervalSpinBox")
+        self.formLayout.setWidget(1, QtWidgets.QFormLayout.FieldRole, self.samplingIntervalSpinBox)
+        self.queueSizeLabel = QtWidgets.QLabel(SubscriptionSettingsDialog)
+        self.queueSizeLabel.setObjectName("queueSizeLabel")
+        self.formLayout.setWidget(2, QtWidgets.QFormLayout.LabelRole, self.queueSizeLabel)
+        self.queueSizeSpinBox = QtWidgets.QSpinBox(SubscriptionSettingsDialog)
+        self.queueSizeSpinBox.setMaximum(100000)
+        self.queueSizeSpinBox.setObjectName("queueSizeSpinBox")
+        self.formLayout.setWidget(2, QtWidgets.QFormLayout.FieldRole, self.queueSizeSpinBox)
+        self.buttonBox = QtWidgets.QDialogButtonBox(SubscriptionSettingsDialog)
+        self.buttonBox.setOrientation(QtCore.Qt.Horizontal)
+        self.buttonBox.setStandardButtons(QtWidgets.QDialogButtonBox.Cancel|QtWidgets.QDialogButtonBox.Ok)
+        self.buttonBox.setObjectName("buttonBox")
+        self.formLayout.setWidget(3, QtWidgets.QFormLayout.SpanningRole, self.buttonBox)
+
+        self.retranslateUi(SubscriptionSettingsDialog)
+        self.buttonBox.accepted.connect(SubscriptionSettingsDialog.accept) # type: ignore
+        self.buttonBox.rejected.connect(SubscriptionSettingsDialog.reject) # type: ignore
+        QtCore.QMetaObject.connectSlotsByName(SubscriptionSettingsDialog)
+
+    def retranslateUi(self, SubscriptionSettingsDialog):
+        _translate = QtCore.QCoreApplication.translate
+        SubscriptionSettingsDialog.setWindowTitle(_translate("SubscriptionSettingsDialog", "Data Change Subscription Settings"))
+        self.publishingIntervalLabel.setText(_translate("SubscriptionSettingsDialog", "Publishing interval"))
+        self.publishingIntervalSpinBox.setSuffix(_translate("SubscriptionSettingsDialog", " ms"))
+        self.samplingIntervalLabel.setText(_translate("SubscriptionSettingsDialog", "Sampling interval"))
+        self.samplingIntervalSpinBox.setSpecialValueText(_translate("SubscriptionSettingsDialog", "Fastest"))
+        self.samplingIntervalSpinBox.setSuffix(_translate("SubscriptionSettingsDialog", " ms"))
+        self.queueSizeLabel.setText(_translate("SubscriptionSettingsDialog", "Queue size"))
+        self.queueSizeSpinBox.setSpecialValueText(_translate("SubscriptionSettingsDialog", "Server default"))
@@ -3,13 +3,60 @@ import logging
 from PyQt5.QtCore import QSettings
 
 from asyncua import ua
-from asyncua.sync import Client, SyncNode
+from asyncua.sync import Client, SyncNode, sync_uaclient_method, data_type_to_variant_type
+from asyncua.client.ua_client import UaClient as AsyncUaClient
 from asyncua import crypto
 from asyncua.tools import endpoint_to_strings
 
 
 logger = logging.getLogger(__name__)
 
+_HAS_PROPERTY = ua.NodeId(ua.ObjectIds.HasProperty)
+
+# items per request when the server does not announce a lower limit
+DEFAULT_CHUNK_SIZE = 1000
+
+# publishing interval in ms of data change subscriptions when none is requested
+DEFAULT_PUBLISHING_INTERVAL = 500
+
+_OPERATION_LIMITS = {
+    "MaxNodesPerRead": ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerRead,
+    "MaxNodesPerBrowse": ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxNodesPerBrowse,
+    "MaxMonitoredItemsPerCall": ua.ObjectIds.Server_ServerCapabilities_OperationLimits_MaxMonitoredItemsPerCall,
+}
+
+
+class NodeMetadata(object):
+    """
+    what the GUI and the logger need to know about a subscribed node,
+    read once when the node is subscribed
+    """
+
+    def __init__(self, node, display_name, data_type, variant_type):
+        self.node = node
+        self.nodeid = node.nodeid
+        self.node_id = node.nodeid.to_string()
+        self.display_name = display_name
+        self.data_type = data_type
+        self.variant_type = variant_type
+        self.node_key = None
+        # requested subscription settings, see UaClient.subscribe_datachange_nodes
+        self.publishing_interval = None
+        self.sampling_interval = None
+        self.queue_size = None
+        # NodeStats of the received samples, while live statistics are shown
+        self.stats = None
+        # graph channel the samples are appended to, while the node is plotted
+        self.channel = None
+
+    @property
+    def data_type_name(self):
+        if self.variant_type is not None:
+            return self.variant_type.name
+        if self.data_type is not None:
+            return self.data_type.to_string()
+        return None
+
 
 class UaClient(object):
     """
@@ -22,10 +69,13 @@ class UaClient(object):
         self.application_uri = "urn:freeopcua:client-gui"
         self.client = None
         self._connected = False
-        self._datachange_sub = None
+        # one data change subscription per publishing interval
+        self._datachange_subs = {}
         self._event_sub = None
+        # nodeid -> (publishing interval, handle)
         self._subs_dc = {}
         self._subs_ev = {}
+        self._operation_limits = {}
         self.security_mode = None
         self.security_policy = None
         self.user_certificate_path = None
@@ -37,10 +87,11 @@ class UaClient(object):
     def _reset(self):
         self.client = None
         self._connected = False
-        self._datachange_sub = None
+        self._datachange_subs = {}
         self._event_sub = None
         self._subs_dc = {}
         self._subs_ev = {}
+        self._operation_limits = {}
 
     @staticmethod
     def get_endpoints(uri):
@@ -123,6 +174,7 @@ class UaClient(object):
             )
         self.client.connect()
         self._connected = True
+        self._read_operation_limits()
         self.client.load_data_type_definitions()
         try:
             self.client.load_enums()
@@ -140,27 +192,220 @@ class UaClient(object):
             finally:
                 self._reset()
 
-    def subscribe_datachange(self, node, handler):
-        if not self._datachange_sub:
-            self._datachange_sub = self.client.create_subscription(500, handler)
-        handle = self._datachange_sub.subscribe_data_change(node)
-        self._subs_dc[node.nodeid] = handle
+    def subscribe_datachange(self, node, handler, publishing_interval=DEFAULT_PUBLISHING_INTERVAL,
+                             sampling_interval=0.0, queue_size=0):
+        sub = self._datachange_subscription(publishing_interval, handler)
+        handle = sub.subscribe_data_change(node, queuesize=queue_size, sampling_interval=sampling_interval)
+        self._subs_dc[node.nodeid] = (publishing_interval, handle)
         return handle
 
     def unsubscribe_datachange(self, node):
-        self._datachange_sub.unsubscribe(self._subs_dc[node.nodeid])
+        self.unsubscribe_datachange_nodes([node])
+
+    def subscribe_datachange_nodes(self, nodes, handler, publishing_interval=DEFAULT_PUBLISHING_INTERVAL,
+                                   sampling_interval=0.0, queue_size=0):
+        """
+        subscribe to data changes of many nodes, with as few CreateMonitoredItems requests
+        as the server allows, and return a dict nodeid -> handle,
+        or the bad StatusCode for nodes the server refused to monitor
+        the nodes join the subscription with the given publishing interval, which is
+        created if needed, sampling_interval (ms, 0: fastest) and queue_size apply to each node
+        """
+        sub = self._datachange_subscription(publishing_interval, handler)
+        results = {}
+        for chunk in self._chunks(nodes, "MaxMonitoredItemsPerCall"):
+            handles = sub.subscribe_data_change(chunk, queuesize=queue_size, sampling_interval=sampling_interval)
+            for node, handle in zip(chunk, handles):
+                if not isinstance(handle, ua.StatusCode):
+                    self._subs_dc[node.nodeid] = (publishing_interval, handle)
+                results[node.nodeid] = handle
+        self._delete_if_unused(publishing_interval)
+        return results
+
+    def unsubscribe_datachange_nodes(self, nodes):
+        handles = {}
+        for node in nodes:
+            if node.nodeid in self._subs_dc:
+                publishing_interval, handle = self._subs_dc.pop(node.nodeid)
+                handles.setdefault(publishing_interval, []).append(handle)
+        for publishing_interval, interval_handles in handles.items():
+            sub = self._datachange_subs[publishing_interval]
+            for chunk in self._chunks(interval_handles, "MaxMonitoredItemsPerCall"):
+                sub.unsubscribe(chunk)
+            self._delete_if_unused(publishing_interval)
+
+    def _delete_if_unused(self, publishing_interval):
+        if any(interval == publishing_interval for interval, _ in self._subs_dc.values()):
+            return
+        sub = self._datachange_subs.pop(publishing_interval, None)
+        if sub is not None:
+            sub.delete()
+
+    def get_datachange_subscriptions(self):
+        """
+        return a dict publishing interval -> number of monitored nodes
+        """
+        counts = dict.fromkeys(self._datachange_subs, 0)
+        for publishing_interval, _ in self._subs_dc.values():
+            counts[publishing_interval] += 1
+        return counts
 
-    def subscribe_events(self, node, handler):
+    def _datachange_subscription(self, publishing_interval, handler):
+        sub = self._datachange_subs.get(publishing_interval)
+        if sub is None:
+            sub = self._datachange_subs[publishing_interval] = self.client.create_subscription(
+                publishing_interval, handler)
+        return sub
+
+    def subscribe_events(self, node, handler, evfilter=None):
+        """
+        evfilter is an ua.EventFilter evaluated by the server, the default selects every BaseEventType field
+        """
         if not self._event_sub:
             print("subscirbing with handler: ", handler, dir(handler))
             self._event_sub = self.client.create_subscription(500, handler)
-        handle = self._event_sub.subscribe_events(node)
+        handle = self._event_sub.subscribe_events(node, evfilter=evfilter)
         self._subs_ev[node.nodeid] = handle
         return handle
 
     def unsubscribe_events(self, node):
         self._event_sub.unsubscribe(self._subs_ev[node.nodeid])
 
+    def read_node_metadata(self, nodes):
+        """
+        read DisplayName and DataType of all nodes in one Read request
+        and return a NodeMetadata for every node
+        """
+        params = ua.ReadParameters()
+        for node in nodes:
+            for attr in (ua.AttributeIds.DisplayName, ua.AttributeIds.DataType):
+                rv = ua.ReadValueId()
+                rv.NodeId = node.nodeid
+                rv.AttributeId = attr
+                params.NodesToRead.append(rv)
+        results = self._read(params.NodesToRead)
+        metadata = []
+        # nodes mostly share a few DataTypes, each one is resolved once
+        variant_types = {}
+        for i, node in enumerate(nodes):
+            name, data_type = results[2 * i], results[2 * i + 1]
+            display_name = name.Value.Value.Text if name.StatusCode.is_good() else node.nodeid.to_string()
+            data_type = data_type.Value.Value if data_type.StatusCode.is_good() else None
+            if data_type not in variant_types:
+                variant_types[data_type] = self._variant_type(data_type)
+            metadata.append(NodeMetadata(node, display_name, data_type, variant_types[data_type]))
+        return metadata
+
+    def _variant_type(self, data_type):
+        if data_type is None:
+            return None
+        if data_type.NamespaceIndex == 0 and data_type.NodeIdType in (ua.NodeIdType.TwoByte, ua.NodeIdType.FourByte,
+                                                                       ua.NodeIdType.Numeric):
+            try:
+                # built in types have the VariantType value as id
+                return ua.VariantType(data_type.Identifier)
+            except ValueError:
+                pass
+        # derived and custom types, their base type is found by browsing the supertypes of the DataType
+        try:
+            return data_type_to_variant_type(self.get_node(data_type))
+        except Exception:
+            logger.exception("Could not find the VariantType of DataType %s", data_type)
+            return None
+
+    def browse_variables(self, nodes):
+        """
+        return the Variable nodes found below nodes in the hierarchy, properties excepted,
+        every level is browsed with as few Browse requests as the server allows
+        """
+        browse = sync_uaclient_method(AsyncUaClient.browse)(self.client)
+        browse_next = sync_uaclient_method(AsyncUaClient.browse_next)(self.client)
+        seen = {node.nodeid for node in nodes}
+        variables = []
+        level = list(nodes)
+        while level:
+            next_level = []
+            for chunk in self._chunks(level, "MaxNodesPerBrowse"):
+                params = ua.BrowseParameters()
+                params.View = ua.ViewDescription()
+                for node in chunk:
+                    desc = ua.BrowseDescription()
+                    desc.NodeId = node.nodeid
+                    desc.BrowseDirection = ua.BrowseDirection.Forward
+                    desc.ReferenceTypeId = ua.NodeId(ua.ObjectIds.HierarchicalReferences)
+                    desc.IncludeSubtypes = True
+                    desc.NodeClassMask = ua.NodeClass.Object | ua.NodeClass.Variable
+                    desc.ResultMask = ua.BrowseResultMask.NodeClass | ua.BrowseResultMask.ReferenceTypeId
+                    params.NodesToBrowse.append(desc)
+                for result in browse(params):
+                    references = list(result.References)
+                    continuation_point = result.ContinuationPoint
+                    while continuation_point:
+                        next_params = ua.BrowseNextParameters()
+                        next_params.ContinuationPoints = [continuation_point]
+                        result = browse_next(next_params)[0]
+                        references.extend(result.References)
+                        continuation_point = result.ContinuationPoint
+                    for ref in references:
+                        if ref.ReferenceTypeId == _HAS_PROPERTY:
+                            continue  # EngineeringUnits, EURange and the like are metadata, not signals
+                        nodeid = ua.NodeId(ref.NodeId.Identifier, ref.NodeId.NamespaceIndex, ref.NodeId.NodeIdType)
+                        if nodeid in seen:
+                            continue
+                        seen.add(nodeid)
+                        node = self.client.get_node(nodeid)
+                        if ref.NodeClass == ua.NodeClass.Variable:
+                            variables.append(node)
+                        next_level.append(node)
+            level = next_level
+        return variables
+
+    def read_values(self, nodes):
+        """
+        read the values of many nodes with as few Read requests as the server allows,
+        return their DataValues in the order of nodes
+        """
+        params = []
+        for node in nodes:
+            rv = ua.ReadValueId()
+            rv.NodeId = node.nodeid
+            rv.AttributeId = ua.AttributeIds.Value
+            params.append(rv)
+        return self._read(params, ua.TimestampsToReturn.Both)
+
+    def _read_operation_limits(self):
+        self._operation_limits = {}
+        params = []
+        for ident in _OPERATION_LIMITS.values():
+            rv = ua.ReadValueId()
+            rv.NodeId = ua.NodeId(ident)
+            rv.AttributeId = ua.AttributeIds.Value
+            params.append(rv)
+        try:
+            results = self._read(params)
+        except Exception:
+            logger.exception("Could not read the operation limits of the server")
+            return
+        for name, result in zip(_OPERATION_LIMITS, results):
+            if result.StatusCode.is_good() and result.Value.Value:
+                self._operation_limits[name] = result.Value.Value
+
+    def _chunks(self, items, limit):
+        # 0 or a missing limit means the server does not restrict the number of items
+        size = min(self._operation_limits.get(limit) or DEFAULT_CHUNK_SIZE, DEFAULT_CHUNK_SIZE)
+        for i in range(0, len(items), size):
+            yield items[i:i + size]
+
+    def _read(self, nodes_to_read, timestamps_to_return=ua.TimestampsToReturn.Source):
+        read = sync_uaclient_method(AsyncUaClient.read)(self.client)
+        results = []
+        for chunk in self._chunks(nodes_to_read, "MaxNodesPerRead"):
+            params = ua.ReadParameters()
+            params.NodesToRead = chunk
+            params.TimestampsToReturn = timestamps_to_return
+            results.extend(read(params))
+        return results
+
     def get_node_attrs(self, node):
         if not isinstance(node, SyncNode):
             node = self.client.get_node(node)